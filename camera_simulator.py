@@ -0,0 +1,280 @@
+#simulated camera farm for load testing the RTSP scanner without production cameras
+import cv2
+import numpy as np
+import os
+import time
+import random
+import csv
+import threading
+from contextlib import closing
+
+SIM_SCHEME = "sim://"
+
+# Farm used by open_simulated_capture() when a "sim://N" address is opened
+_active_farm = None
+
+class SimulatedCamera:
+    """
+    File-backed stand-in for cv2.VideoCapture that loops an MP4 file
+    and injects jitter, disconnects and frame-rate changes
+    """
+    def __init__(self, camera_id, video_path, farm):
+        self.camera_id = camera_id
+        self.video_path = video_path
+        self.farm = farm
+        self.cap = cv2.VideoCapture(video_path)
+        self.opened = self.cap.isOpened() and not farm.is_down(camera_id)
+        self.fps = farm.fps_for(camera_id, self.cap.get(cv2.CAP_PROP_FPS) or 25)
+        self.next_frame_time = time.time()
+        self.last_frame_time = None  # When the last returned frame became "available"
+        self.frames_served = 0
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return self.cap.get(prop_id)
+
+    def set(self, prop_id, value):
+        # Buffer size has no meaning for a file-backed stream
+        if prop_id == cv2.CAP_PROP_BUFFERSIZE:
+            return True
+        return self.cap.set(prop_id, value)
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def read(self):
+        """Return the next frame, paced like a live camera"""
+        if not self.opened:
+            return False, None
+
+        # Random disconnect: the stream dies and the camera stays down for a while
+        if self.farm.roll_disconnect(self.camera_id):
+            print(f"[sim] Camera {self.camera_id} disconnected")
+            self.opened = False
+            return False, None
+
+        # Frame-rate changes are picked up on the fly
+        self.fps = self.farm.fps_for(self.camera_id, self.fps)
+
+        # Pace frames in real time with jitter, like a network camera would
+        if self.farm.realtime:
+            jitter = self.farm.roll_jitter()
+            self.next_frame_time += 1.0 / max(self.fps, 1e-3)
+            delay = self.next_frame_time + jitter - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Consumer is far behind; a live camera drops frames rather than queueing them
+                self.next_frame_time = time.time()
+
+        ret, frame = self.cap.read()
+        if not ret:
+            # Loop the file
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+            if not ret:
+                self.opened = False
+                return False, None
+
+        self.last_frame_time = time.time()
+        self.frames_served += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+        self.cap.release()
+
+class CameraFarm:
+    """A set of simulated cameras backed by a small pool of looping MP4 files"""
+    def __init__(self, video_files, num_cameras, jitter_ms=20, disconnect_prob=0.0,
+                 disconnect_duration=10.0, fps_choices=None, fps_change_interval=0,
+                 realtime=True, seed=None):
+        if not video_files:
+            raise ValueError("CameraFarm needs at least one video file")
+        self.video_files = list(video_files)
+        self.num_cameras = num_cameras
+        self.jitter_ms = jitter_ms
+        self.disconnect_prob = disconnect_prob  # Probability per frame read
+        self.disconnect_duration = disconnect_duration  # Seconds a camera stays down
+        self.fps_choices = fps_choices or []  # e.g. [25, 15, 5]
+        self.fps_change_interval = fps_change_interval  # Seconds between fps changes, 0 = never
+        self.realtime = realtime
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.down_until = {}
+        self.fps_state = {}
+
+    def addresses(self):
+        """Return the scanner addresses for all simulated cameras"""
+        return [f"{SIM_SCHEME}{i}" for i in range(self.num_cameras)]
+
+    def write_address_csv(self, csv_file):
+        """Write a CSV in the same format as rtsp_address.csv"""
+        with open(csv_file, 'w', newline='') as file:
+            writer = csv.writer(file)
+            for address in self.addresses():
+                writer.writerow([address])
+        print(f"Wrote {self.num_cameras} simulated addresses to {csv_file}")
+        return csv_file
+
+    def roll_jitter(self):
+        """Seconds a frame arrives early (negative) or late, from the seeded generator"""
+        with self.lock:
+            return self.rng.uniform(-self.jitter_ms, self.jitter_ms) / 1000.0
+
+    def is_down(self, camera_id):
+        with self.lock:
+            return self.down_until.get(camera_id, 0) > time.time()
+
+    def roll_disconnect(self, camera_id):
+        if self.disconnect_prob <= 0:
+            return False
+        with self.lock:
+            if self.rng.random() < self.disconnect_prob:
+                self.down_until[camera_id] = time.time() + self.disconnect_duration
+                return True
+        return False
+
+    def fps_for(self, camera_id, default_fps):
+        if not self.fps_choices or self.fps_change_interval <= 0:
+            return default_fps
+        with self.lock:
+            fps, changed_at = self.fps_state.get(camera_id, (default_fps, time.time()))
+            if time.time() - changed_at >= self.fps_change_interval:
+                fps = self.rng.choice(self.fps_choices)
+                changed_at = time.time()
+                print(f"[sim] Camera {camera_id} frame rate changed to {fps} FPS")
+            self.fps_state[camera_id] = (fps, changed_at)
+            return fps
+
+    def open(self, address):
+        """Open a "sim://N" address and return a VideoCapture-like object"""
+        camera_id = int(str(address)[len(SIM_SCHEME):])
+        video_path = self.video_files[camera_id % len(self.video_files)]
+        return SimulatedCamera(camera_id, video_path, self)
+
+def set_active_farm(farm):
+    """Register the farm used for "sim://" addresses"""
+    global _active_farm
+    _active_farm = farm
+
+def is_simulated_source(source):
+    return isinstance(source, str) and source.startswith(SIM_SCHEME)
+
+def open_simulated_capture(source):
+    """Open a "sim://N" address on the active farm"""
+    if _active_farm is None:
+        raise RuntimeError("No simulated camera farm registered; call set_active_farm() first")
+    return _active_farm.open(source)
+
+def run_scaling_test(model, video_files, camera_counts=(10, 50, 200), seconds_per_camera=2,
+                     total_seconds=60, camera_defaults=None, frame_writer=None, threads=True,
+                     results_csv="load_test_results.csv", **farm_options):
+    """
+    Drive the scanner's own pipeline (scan_stream) headlessly against
+    simulated cameras and record throughput and detection latency for each
+    farm size. camera_defaults are the scan settings of every simulated
+    camera, like the defaults of process_rtsp_rotation; each camera is
+    visited for seconds_per_camera. Flagged frames are saved through
+    frame_writer like in production (synchronously without one).
+    """
+    from suspected_det_scancam import setup_video_source, scan_stream
+    from camera_config import CameraConfig, CameraConfigStore
+    from roi_follower import ROIFollower
+
+    camera_defaults = (camera_defaults or CameraConfig()).with_overrides(
+        None, {"switch_interval": seconds_per_camera})
+
+    summaries = []
+    for num_cameras in camera_counts:
+        farm = CameraFarm(video_files, num_cameras, **farm_options)
+        set_active_farm(farm)
+        csv_file = farm.write_address_csv(f"sim_cameras_{num_cameras}.csv")
+        camera_config = CameraConfigStore(csv_file, defaults=camera_defaults)
+        addresses = camera_config.addresses()
+
+        print(f"\n=== Load test: {num_cameras} simulated cameras for {total_seconds}s ===")
+        frames_processed = 0
+        failed_opens = 0
+        detection_latencies = []  # Frame read -> evidence stage finished
+        revisit_gaps = []  # Seconds between two visits of the same camera
+        last_visit = {}
+
+        test_start = time.time()
+        index = 0
+        while time.time() - test_start < total_seconds:
+            address = addresses[index]
+            index = (index + 1) % num_cameras
+
+            if address in last_visit:
+                revisit_gaps.append(time.time() - last_visit[address])
+            last_visit[address] = time.time()
+
+            cap = setup_video_source(address)
+            if not cap.isOpened():
+                failed_opens += 1
+                continue
+
+            # Same stages, settings and crop following as a rotation visit, minus the window
+            _, packets = scan_stream(cap, address, lambda address=address: camera_config.get(address),
+                                     model, ROIFollower(), frame_writer=frame_writer,
+                                     switch_after=True, threads=threads)
+            with closing(packets):
+                for packet in packets:
+                    detection_latencies.append(time.time() - packet.timestamp)
+                    frames_processed += 1
+            cap.release()
+
+        elapsed = time.time() - test_start
+        summary = {
+            "cameras": num_cameras,
+            "seconds": round(elapsed, 1),
+            "frames": frames_processed,
+            "throughput_fps": round(frames_processed / elapsed, 2) if elapsed > 0 else 0,
+            "latency_p50_ms": round(float(np.percentile(detection_latencies, 50)) * 1000, 1) if detection_latencies else None,
+            "latency_p95_ms": round(float(np.percentile(detection_latencies, 95)) * 1000, 1) if detection_latencies else None,
+            "cameras_visited": len(last_visit),
+            "max_revisit_s": round(max(revisit_gaps), 1) if revisit_gaps else None,
+            "failed_opens": failed_opens,
+        }
+        summaries.append(summary)
+        print(f"Result: {summary}")
+
+    set_active_farm(None)
+
+    if results_csv:
+        write_header = not os.path.exists(results_csv)
+        with open(results_csv, 'a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(summaries[0].keys()))
+            if write_header:
+                writer.writeheader()
+            writer.writerows(summaries)
+        print(f"Load test results appended to {results_csv}")
+
+    return summaries
+
+if __name__ == "__main__":
+    from ultralytics import YOLO
+    from camera_config import CameraConfig
+
+    model = YOLO("yolo11s-pose.pt")
+
+    # Any short clips of the production line work as camera sources
+    sample_folder = "sim_videos"
+    sample_videos = [os.path.join(sample_folder, f) for f in sorted(os.listdir(sample_folder))
+                     if f.lower().endswith('.mp4')]
+
+    # Settings of the production rotation (suspected_det_scancam.process_specific_sources)
+    camera_defaults = CameraConfig(roi_left=0.10, roi_right=0.90, imgsz=640,
+                                   min_wrist_percent=-20, max_wrist_percent=20,
+                                   max_shoulder_percent=10, full_scan_every=15)
+
+    run_scaling_test(model, sample_videos, camera_counts=(10, 50, 200),
+                     seconds_per_camera=2, total_seconds=120, camera_defaults=camera_defaults,
+                     jitter_ms=30, disconnect_prob=0.001, disconnect_duration=15,
+                     fps_choices=[25, 15, 10], fps_change_interval=20, seed=42)
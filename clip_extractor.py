@@ -0,0 +1,107 @@
+#evidence clips cut from the source recording in the background, by stream copy where possible
+import os
+import time
+import queue
+import shutil
+import threading
+import subprocess
+
+class ClipExtractor:
+    """
+    Worker threads that cut clips out of the source file while the scan goes
+    on. ffmpeg copies the compressed packets (no decoding, no re-encoding),
+    so a clip starts at the keyframe at or before the requested start. If
+    ffmpeg is missing or fails, fallback(source, start_frame, end_frame,
+    base_filename, save_folder) is used instead.
+    """
+    def __init__(self, save_folder="spool_pose_clips", num_workers=1, max_queue=16,
+                 fallback=None, ffmpeg="ffmpeg"):
+        self.save_folder = save_folder
+        self.fallback = fallback
+        self.ffmpeg = shutil.which(ffmpeg)
+        if self.ffmpeg is None:
+            print(f"{ffmpeg} not found; clips will be re-encoded")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.counters = {"submitted": 0, "copied": 0, "reencoded": 0, "failed": 0, "seconds": 0.0}
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker, name=f"clip-extractor-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def submit(self, source, start_frame, end_frame, fps, base_filename):
+        """
+        Queue frames start_frame..end_frame of source as <base_filename>.mp4.
+        Blocks while the queue is full; returns the clip path.
+        """
+        path = os.path.join(self.save_folder, f"{base_filename}.mp4")
+        self._count("submitted")
+        self.queue.put((source, start_frame, end_frame, fps or 30, base_filename, path))
+        return path
+
+    def _copy(self, source, start_frame, end_frame, fps, path):
+        # Written under a temporary name so a half-cut clip is never mistaken for evidence
+        partial = path[:-len(".mp4")] + ".part.mp4"
+        command = [self.ffmpeg, "-y", "-v", "error",
+                   "-ss", f"{start_frame / fps:.3f}", "-i", source,
+                   "-t", f"{(end_frame - start_frame + 1) / fps:.3f}",
+                   "-c", "copy", "-avoid_negative_ts", "make_zero", partial]
+        try:
+            subprocess.run(command, capture_output=True, check=True)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            source, start_frame, end_frame, fps, base_filename, path = item
+            cut_start = time.time()
+            try:
+                os.makedirs(self.save_folder, exist_ok=True)
+                try:
+                    if self.ffmpeg is None:
+                        raise RuntimeError("ffmpeg not available")
+                    self._copy(source, start_frame, end_frame, fps, path)
+                    self._count("copied")
+                except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+                    if self.fallback is None:
+                        raise
+                    if self.ffmpeg is not None:
+                        print(f"Stream copy failed for {path}, re-encoding: {e}")
+                    self.fallback(source, start_frame, end_frame, base_filename, self.save_folder)
+                    self._count("reencoded")
+            except Exception as e:
+                print(f"Error extracting clip {path}: {e}")
+                self._count("failed")
+            finally:
+                self._count("seconds", time.time() - cut_start)
+                self.queue.task_done()
+
+    def stats(self):
+        """Return a snapshot of the extractor counters"""
+        with self.lock:
+            snapshot = dict(self.counters)
+        snapshot["queued"] = self.queue.qsize()
+        return snapshot
+
+    def flush(self):
+        """Wait until every queued clip has been cut"""
+        self.queue.join()
+
+    def close(self):
+        """Cut the remaining clips and stop the workers"""
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        print(f"Clip extractor closed: {self.stats()}")
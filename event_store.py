@@ -0,0 +1,156 @@
+#append-only detection event store (SQLite in WAL mode) indexed by time and camera
+import sqlite3
+import json
+import os
+import time
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera TEXT,
+    ts REAL NOT NULL,
+    frame_count INTEGER,
+    person INTEGER,
+    persons INTEGER,
+    track_id INTEGER,
+    validation TEXT,
+    bbox TEXT,
+    file_name TEXT NOT NULL,
+    file_path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_camera_ts ON detections (camera, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_file ON detections (file_name);
+
+CREATE TABLE IF NOT EXISTS verifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    ts REAL NOT NULL,
+    unzip_confidence INTEGER,
+    looking_confidence INTEGER,
+    headcount INTEGER,
+    model TEXT,
+    latency_ms REAL,
+    payload_bytes INTEGER,
+    file_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_verifications_file ON verifications (file_name);
+CREATE INDEX IF NOT EXISTS idx_verifications_ts ON verifications (ts);
+"""
+
+def validation_percentages(validation):
+    """Reduce a validate_pose_positions() result to its per-joint percentages"""
+    if not validation:
+        return None
+    percentages = {}
+    for joint, result in validation.items():
+        if "vertical_percent" in result:
+            percentages[joint] = round(float(result["vertical_percent"]), 1)
+        elif "horizontal_distance" in result:
+            percentages[joint] = round(float(result["horizontal_distance"]), 1)
+    return percentages
+
+def validation_measured(validation):
+    """Which joints of a validate_pose_positions() result were actually measured"""
+    if not validation:
+        return None
+    return {joint: bool(result.get("measured", True)) for joint, result in validation.items()}
+
+class EventStore:
+    """Detections are written by the scanner, VLM scores by the verifiers"""
+    def __init__(self, db_path="events.db"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # One connection shared by the frame loop and the background writer threads
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, no fsync per insert
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns("verifications", {"payload_bytes": "INTEGER"})
+        self.conn.commit()
+
+    def _add_missing_columns(self, table, columns):
+        # Databases created by older versions keep working
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def record_detection(self, camera, file_path, timestamp=None, frame_count=None, person=None,
+                         persons=None, track_id=None, validation=None, bbox=None):
+        """Append one detection; returns its row id"""
+        row = (
+            camera,
+            timestamp if timestamp is not None else time.time(),
+            frame_count,
+            person,
+            persons,
+            track_id,
+            json.dumps(validation_percentages(validation)) if validation else None,
+            json.dumps([int(v) for v in bbox]) if bbox is not None else None,
+            os.path.basename(file_path),
+            file_path,
+        )
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO detections (camera, ts, frame_count, person, persons, track_id, "
+                "validation, bbox, file_name, file_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def record_verification(self, file_path, scores, model=None, latency_ms=None, payload_bytes=None):
+        """Append the VLM result for an image; file_path is where the image ended up"""
+        scores = scores or {}
+        row = (
+            os.path.basename(file_path),
+            time.time(),
+            scores.get("unzip_confidence"),
+            scores.get("looking_confidence"),
+            scores.get("headcount"),
+            model,
+            latency_ms,
+            payload_bytes,
+            file_path,
+        )
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO verifications (file_name, ts, unzip_confidence, looking_confidence, "
+                "headcount, model, latency_ms, payload_bytes, file_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self.conn.commit()
+
+    def detections_between(self, start_ts, end_ts, camera=None):
+        """Detections in [start_ts, end_ts) joined with their latest VLM scores"""
+        query = (
+            "SELECT d.camera, d.ts, d.frame_count, d.person, d.track_id, d.validation, d.file_path, "
+            "v.unzip_confidence, v.looking_confidence, v.headcount, v.file_path "
+            "FROM detections d LEFT JOIN verifications v ON v.id = ("
+            "  SELECT MAX(id) FROM verifications WHERE file_name = d.file_name) "
+            "WHERE d.ts >= ? AND d.ts < ?")
+        params = [start_ts, end_ts]
+        if camera is not None:
+            query += " AND d.camera = ?"
+            params.append(camera)
+        query += " ORDER BY d.ts"
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def counts_by_camera(self, start_ts, end_ts, min_unzip_confidence=None):
+        """Per-camera detection counts for a shift, optionally only confirmed ones"""
+        query = ("SELECT d.camera, COUNT(*) FROM detections d")
+        params = []
+        if min_unzip_confidence is not None:
+            query += (" JOIN verifications v ON v.id = ("
+                      "  SELECT MAX(id) FROM verifications WHERE file_name = d.file_name)"
+                      " WHERE v.unzip_confidence >= ? AND")
+            params.append(min_unzip_confidence)
+        else:
+            query += " WHERE"
+        query += " d.ts >= ? AND d.ts < ? GROUP BY d.camera ORDER BY COUNT(*) DESC"
+        params.extend([start_ts, end_ts])
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,114 @@
+#crop-only evidence storage: padded person crops plus a compact detection sidecar
+import numpy as np
+import os
+import json
+import time
+from frame_writer import sidecar_path, encode_jpeg
+from spool import atomic_write_bytes
+from event_store import validation_percentages, validation_measured
+from pose_rules import DEFAULT_MIN_KEYPOINT_CONF
+
+EVIDENCE_FRAME = "frame"  # Whole annotated frame (original behaviour)
+EVIDENCE_CROPS = "crops"  # Padded person crops + sidecar, optional low-quality overview
+
+def person_bbox_from_keypoints(person_kpts, frame_shape, padding=0.25, person_conf=None,
+                               min_conf=DEFAULT_MIN_KEYPOINT_CONF):
+    """
+    Bounding box around the detected keypoints of one person, padded by a fraction
+    of its size and clipped to the frame. With person_conf, keypoints below
+    min_conf count as missing, as in pose validation. Returns (x1, y1, x2, y2) or None.
+    """
+    kpts = np.asarray(person_kpts, dtype=np.float32).reshape(-1, 2)
+    present = (kpts[:, 0] > 0) & (kpts[:, 1] > 0)
+    if person_conf is not None:
+        present &= np.asarray(person_conf, dtype=np.float32).reshape(-1) >= min_conf
+    if not present.any():
+        return None
+
+    xs = kpts[present, 0]
+    ys = kpts[present, 1]
+    x1, x2 = xs.min(), xs.max()
+    y1, y2 = ys.min(), ys.max()
+
+    # Keypoints sit inside the body outline, so pad generously
+    pad_x = max((x2 - x1) * padding, 16)
+    pad_y = max((y2 - y1) * padding, 16)
+
+    height, width = frame_shape[:2]
+    x1 = int(max(0, x1 - pad_x))
+    y1 = int(max(0, y1 - pad_y))
+    x2 = int(min(width, x2 + pad_x))
+    y2 = int(min(height, y2 + pad_y))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+def build_person_record(person_index, person_kpts, person_conf, bbox):
+    """Compact per-person record: box, keypoints (frame coordinates) and confidences"""
+    kpts = np.asarray(person_kpts, dtype=np.float32).reshape(-1, 2)
+    return {
+        "person": person_index,
+        "bbox": [int(v) for v in bbox],
+        "keypoints": [[round(float(x), 1), round(float(y), 1)] for x, y in kpts],
+        "confidences": ([round(float(c), 3) for c in np.asarray(person_conf).reshape(-1)]
+                        if person_conf is not None else None)
+    }
+
+def _write_image(frame, path, metadata, jpeg_quality, frame_writer):
+    if frame_writer is not None:
+        return frame_writer.submit(frame, path, metadata, jpeg_quality=jpeg_quality)
+    # Same publish order as the background writer: sidecar first, then the image
+    if metadata is not None:
+        atomic_write_bytes(sidecar_path(path), json.dumps(metadata).encode('utf-8'))
+    atomic_write_bytes(path, encode_jpeg(frame, jpeg_quality))
+    return True
+
+def save_crop_evidence(frame, base_name, person_keypoints, person_confidences=None, source=None,
+                       frame_count=None, timestamp=None, frame_writer=None,
+                       crop_folder="zipping_pose", frame_folder="zipping_pose_frames",
+                       padding=0.25, crop_quality=90, keep_frame=True, frame_quality=40,
+                       person_validations=None, validation_ranges=None,
+                       min_keypoint_conf=DEFAULT_MIN_KEYPOINT_CONF):
+    """
+    Save one padded crop per flagged person with a sidecar record each.
+    The full frame is optionally kept as a low-quality overview outside the
+    verifier's folder, so only the crops are sent to the VLM.
+    Boxes ignore keypoints below min_keypoint_conf.
+    Returns a list of (person_index, crop_path, bbox).
+    """
+    os.makedirs(crop_folder, exist_ok=True)
+    timestamp = timestamp if timestamp is not None else int(time.time())
+
+    frame_file = None
+    if keep_frame:
+        os.makedirs(frame_folder, exist_ok=True)
+        frame_file = os.path.join(frame_folder, f"{base_name}.jpg")
+        _write_image(frame, frame_file, None, frame_quality, frame_writer)
+
+    crop_files = []
+    for person_index, person_kpts in enumerate(person_keypoints):
+        person_conf = person_confidences[person_index] if person_confidences is not None else None
+        bbox = person_bbox_from_keypoints(person_kpts, frame.shape, padding, person_conf, min_keypoint_conf)
+        if bbox is None:
+            continue
+        x1, y1, x2, y2 = bbox
+
+        record = {
+            "camera": source,
+            "timestamp": timestamp,
+            "frame_count": frame_count,
+            "frame_file": frame_file,
+            "frame_size": [int(frame.shape[1]), int(frame.shape[0])],
+        }
+        record.update(build_person_record(person_index, person_kpts, person_conf, bbox))
+        if person_validations is not None:
+            record["validation"] = validation_percentages(person_validations[person_index])
+            record["measured"] = validation_measured(person_validations[person_index])
+            record["ranges"] = validation_ranges
+
+        crop_file = os.path.join(crop_folder, f"{base_name}_p{person_index}.jpg")
+        # Slicing is a view; the writer copies it before queueing
+        _write_image(frame[y1:y2, x1:x2], crop_file, record, crop_quality, frame_writer)
+        crop_files.append((person_index, crop_file, bbox))
+
+    return crop_files
@@ -0,0 +1,142 @@
+#background JPEG writer so saving detections does not stall the frame loop
+import cv2
+import os
+import json
+import time
+import queue
+import threading
+from spool import atomic_write_bytes
+from resource_budget import pin_current_thread
+
+# What to do when the write queue is full
+POLICY_BLOCK = "block"              # Backpressure: the frame loop waits for a free slot
+POLICY_DROP_NEWEST = "drop_newest"  # Discard the frame being submitted
+POLICY_DROP_OLDEST = "drop_oldest"  # Discard the oldest queued frame to make room
+
+def encode_jpeg(frame, jpeg_quality=90):
+    """Encode a frame to JPEG bytes"""
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buffer.tobytes()
+
+def sidecar_path(image_path):
+    """Return the metadata file that belongs to an image"""
+    return os.path.splitext(image_path)[0] + ".json"
+
+class AsyncFrameWriter:
+    """Bounded pool of threads that encode and write detection frames plus metadata"""
+    def __init__(self, num_workers=2, max_queue=32, jpeg_quality=90,
+                 policy=POLICY_BLOCK, block_timeout=None, cores=None):
+        if policy not in (POLICY_BLOCK, POLICY_DROP_NEWEST, POLICY_DROP_OLDEST):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.jpeg_quality = jpeg_quality
+        self.policy = policy
+        self.block_timeout = block_timeout  # None = wait forever under POLICY_BLOCK
+        self.cores = cores  # CPUs the encoder threads are pinned to, None = any
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.counters = {
+            "submitted": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "blocked": 0,          # Submissions that had to wait for a free slot
+            "blocked_seconds": 0.0,
+        }
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker, name=f"frame-writer-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def submit(self, frame, path, metadata=None, jpeg_quality=None):
+        """Queue a frame for writing; returns False if it was dropped"""
+        # Copy now: the caller keeps drawing on its frame after saving
+        item = (frame.copy(), path, metadata, jpeg_quality or self.jpeg_quality)
+        self._count("submitted")
+
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == POLICY_DROP_NEWEST:
+            self._count("dropped")
+            return False
+
+        if self.policy == POLICY_DROP_OLDEST:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    self._count("dropped")
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    continue
+
+        # POLICY_BLOCK
+        self._count("blocked")
+        wait_start = time.time()
+        try:
+            self.queue.put(item, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            self._count("dropped")
+            return False
+        finally:
+            self._count("blocked_seconds", time.time() - wait_start)
+
+    def _worker(self):
+        pin_current_thread(self.cores)
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            frame, path, metadata, jpeg_quality = item
+            try:
+                self._write(frame, path, metadata, jpeg_quality)
+                self._count("written")
+            except Exception as e:
+                print(f"Error writing frame {path}: {e}")
+                self._count("failed")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, frame, path, metadata, jpeg_quality):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Metadata first, so a visible image always has its sidecar
+        if metadata is not None:
+            atomic_write_bytes(sidecar_path(path), json.dumps(metadata).encode('utf-8'))
+        atomic_write_bytes(path, encode_jpeg(frame, jpeg_quality))
+
+    def stats(self):
+        """Return a snapshot of the writer counters"""
+        with self.lock:
+            snapshot = dict(self.counters)
+        snapshot["queued"] = self.queue.qsize()
+        return snapshot
+
+    def flush(self):
+        """Wait until everything queued so far has been written"""
+        self.queue.join()
+
+    def close(self):
+        """Write out the remaining queue and stop the workers"""
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        print(f"Frame writer closed: {self.stats()}")
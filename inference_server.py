@@ -0,0 +1,365 @@
+#one pose model per node: a long-lived server that batches requests from the detector scripts
+import os
+import sys
+import time
+import queue
+import secrets
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+# Private per-user directory (0700) for the socket and the key file
+RUNTIME_DIR = os.environ.get("POSE_SERVER_DIR", os.path.join(os.path.expanduser("~"), ".pose_inference"))
+AUTHKEY_FILE = os.path.join(RUNTIME_DIR, "authkey")
+# Unix socket on Linux, named pipe on Windows (multiprocessing picks the family from the address)
+DEFAULT_ADDRESS = r"\\.\pipe\pose_inference" if sys.platform == "win32" else os.path.join(RUNTIME_DIR, "server.sock")
+
+def load_authkey(key_file=AUTHKEY_FILE):
+    """
+    Shared secret of server and clients: POSE_SERVER_AUTHKEY, else the
+    contents of key_file. None if neither is set; a key file that other
+    users can read is refused.
+    """
+    secret = os.environ.get("POSE_SERVER_AUTHKEY")
+    if secret:
+        return secret.encode('utf-8')
+    try:
+        with open(key_file, 'rb') as f:
+            if sys.platform != "win32" and os.fstat(f.fileno()).st_mode & 0o077:
+                print(f"Ignoring {key_file}: readable by other users (chmod 600 it)")
+                return None
+            secret = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return secret or None
+
+def create_authkey(key_file=AUTHKEY_FILE):
+    """Write a new random key, readable by the owner only"""
+    os.makedirs(os.path.dirname(key_file), mode=0o700, exist_ok=True)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secrets.token_hex(32))
+    print(f"New inference server key written to {key_file}")
+
+def prepare_socket_dir(address):
+    """Create the socket's directory owner-only and remove a stale socket of a previous run"""
+    directory = os.path.dirname(address)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} belongs to another user")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+    if os.path.exists(address):
+        os.remove(address)
+
+def result_to_arrays(result):
+    """Ultralytics pose result -> plain numpy arrays that pickle cheaply"""
+    keypoints = result.keypoints
+    return {
+        "xyxy": result.boxes.xyxy.cpu().numpy().astype(np.float32),
+        "conf": result.boxes.conf.cpu().numpy().astype(np.float32),
+        "keypoints": keypoints.xy.cpu().numpy().astype(np.float32),
+        "keypoint_conf": (keypoints.conf.cpu().numpy().astype(np.float32)
+                          if keypoints.conf is not None else None),
+        "orig_shape": tuple(result.orig_shape),
+    }
+
+class HostArray:
+    """numpy array behind the .cpu().numpy() chain callers use on torch tensors"""
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def __len__(self):
+        return len(self.array)
+
+class RemoteBoxes:
+    def __init__(self, arrays):
+        self.xyxy = HostArray(arrays["xyxy"])
+        self.conf = HostArray(arrays["conf"])
+
+    def __len__(self):
+        return len(self.xyxy)
+
+class RemoteKeypoints:
+    def __init__(self, arrays):
+        xy = arrays["keypoints"]
+        conf = arrays["keypoint_conf"]
+        height, width = arrays["orig_shape"][:2]
+        self.xy = HostArray(xy)
+        self.xyn = HostArray(xy / np.array([width, height], dtype=np.float32))
+        self.conf = HostArray(conf) if conf is not None else None
+        self.data = HostArray(np.concatenate([xy, conf[..., None]], axis=-1) if conf is not None else xy)
+
+    def __len__(self):
+        return len(self.xy)
+
+class RemoteResult:
+    """The parts of an ultralytics pose result the scanners read: boxes and keypoints"""
+    def __init__(self, arrays):
+        self.orig_shape = arrays["orig_shape"]
+        self.boxes = RemoteBoxes(arrays)
+        self.keypoints = RemoteKeypoints(arrays)
+
+    def __len__(self):
+        return len(self.boxes)
+
+class _Request:
+    def __init__(self, images, options):
+        self.images = images
+        self.options = options
+        self.key = tuple(sorted(options.items()))  # Only requests with the same options share a batch
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+class InferenceServer:
+    """
+    Owns the model and a batching queue. Each client connection has a
+    thread that queues its requests; one inference thread takes up to
+    max_batch images with the same options (conf, imgsz), waiting at most
+    max_wait_ms for more, and runs them as one batch.
+    """
+    def __init__(self, model, authkey, address=DEFAULT_ADDRESS, max_batch=8, max_wait_ms=5, max_queue=64):
+        if not authkey:
+            raise ValueError("InferenceServer needs an authkey")
+        self.model = model
+        self.address = address
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.counters = {"clients": 0, "requests": 0, "images": 0, "batches": 0, "errors": 0,
+                         "inference_seconds": 0.0}
+        self.listener = None
+        self.stopped = threading.Event()
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def _collect(self, first, waiting):
+        """first plus compatible requests already waiting or arriving within max_wait"""
+        batch, held = [first], []
+        images = len(first.images)
+        for request in waiting:
+            if request.key == first.key and images + len(request.images) <= self.max_batch:
+                batch.append(request)
+                images += len(request.images)
+            else:
+                held.append(request)
+        deadline = time.time() + self.max_wait
+        while images < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.key == first.key and images + len(request.images) <= self.max_batch:
+                batch.append(request)
+                images += len(request.images)
+            else:
+                held.append(request)
+        return batch, held
+
+    def _inference_loop(self):
+        held = []
+        while not self.stopped.is_set():
+            if held:
+                first = held.pop(0)
+            else:
+                try:
+                    first = self.requests.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            batch, held = self._collect(first, held)
+            images = [image for request in batch for image in request.images]
+            inference_start = time.time()
+            try:
+                results = self.model(images, verbose=False, **dict(first.key))
+                arrays = [result_to_arrays(result) for result in results]
+            except Exception as e:
+                self._count("errors")
+                for request in batch:
+                    request.error = str(e)
+                    request.done.set()
+                continue
+            self._count("inference_seconds", time.time() - inference_start)
+            self._count("batches")
+            self._count("images", len(images))
+            offset = 0
+            for request in batch:
+                request.results = arrays[offset:offset + len(request.images)]
+                offset += len(request.images)
+                request.done.set()
+
+    def _serve_client(self, conn):
+        self._count("clients")
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                command = message[0]
+                if command == "predict":
+                    request = _Request(message[1], message[2])
+                    self.requests.put(request)
+                    self._count("requests")
+                    request.done.wait()
+                    if request.error is not None:
+                        conn.send(("error", request.error))
+                    else:
+                        conn.send(("ok", request.results))
+                elif command == "stats":
+                    conn.send(("ok", self.stats()))
+                else:
+                    conn.send(("error", f"Unknown command: {command}"))
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+        snapshot["queued"] = self.requests.qsize()
+        if snapshot["batches"]:
+            snapshot["avg_batch"] = round(snapshot["images"] / snapshot["batches"], 2)
+        return snapshot
+
+    def serve_forever(self):
+        unix_socket = isinstance(self.address, str) and self.address.startswith("/")
+        if unix_socket:
+            prepare_socket_dir(self.address)
+            umask = os.umask(0o177)  # Socket is created 0600
+            try:
+                self.listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(umask)
+        else:
+            self.listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._inference_loop, name="inference", daemon=True).start()
+        print(f"Inference server listening on {self.address}")
+        try:
+            while not self.stopped.is_set():
+                try:
+                    conn = self.listener.accept()
+                except Exception as e:  # Failed handshake, wrong authkey
+                    print(f"Rejected client: {e}")
+                    continue
+                threading.Thread(target=self._serve_client, args=(conn,), name="inference-client",
+                                 daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        self.stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            print(f"Inference server stopped: {self.stats()}")
+
+class RemotePoseModel:
+    """
+    Thin client with the call signature of a YOLO model:
+    model(image_or_images, conf=..., imgsz=...) returns result objects with
+    boxes.xyxy/conf and keypoints.xy/conf. Safe to share between threads.
+    """
+    def __init__(self, authkey, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.authkey = authkey
+        self.lock = threading.Lock()
+        self.conn = Client(address, authkey=authkey)
+
+    def _request(self, message):
+        with self.lock:
+            try:
+                self.conn.send(message)
+                status, payload = self.conn.recv()
+            except (EOFError, OSError):
+                # Server restarted: reconnect once and retry
+                self.conn = Client(self.address, authkey=self.authkey)
+                self.conn.send(message)
+                status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+    def __call__(self, source, conf=0.25, imgsz=640, verbose=True, **kwargs):
+        images = list(source) if isinstance(source, (list, tuple)) else [source]
+        options = dict(kwargs, conf=conf, imgsz=imgsz)
+        return [RemoteResult(arrays) for arrays in self._request(("predict", images, options))]
+
+    def to(self, device):
+        return self  # The server decides where the model runs
+
+    def stats(self):
+        return self._request(("stats",))
+
+    def close(self):
+        self.conn.close()
+
+def pose_model(weights="yolo11s-pose.pt", address=DEFAULT_ADDRESS, device=None, **loader_options):
+    """
+    Client of the node's inference server if one is running and accepts our
+    key, otherwise a local lazily loaded model (see model_loader.py)
+    """
+    authkey = load_authkey()
+    if authkey is None:
+        print(f"No inference server key (POSE_SERVER_AUTHKEY or {AUTHKEY_FILE}); loading {weights} in this process")
+    else:
+        try:
+            model = RemotePoseModel(authkey, address)
+            print(f"Using inference server at {address}")
+            return model
+        except AuthenticationError as e:
+            print(f"Inference server at {address} rejected our key ({e}); POSE_SERVER_AUTHKEY or "
+                  f"{AUTHKEY_FILE} differs from the server's. Loading {weights} in this process")
+        except (OSError, EOFError) as e:
+            print(f"No inference server at {address} ({e}); loading {weights} in this process")
+    from model_loader import LazyPoseModel
+    return LazyPoseModel(weights, device=device, **loader_options)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared pose inference server")
+    parser.add_argument("--weights", default="yolo11s-pose.pt")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--export-format", default=None, help="e.g. openvino or onnx, cached in model_cache/")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--key-file", default=AUTHKEY_FILE, help="used when POSE_SERVER_AUTHKEY is not set")
+    parser.add_argument("--create-key", action="store_true", help="write a new random key to --key-file and exit")
+    args = parser.parse_args()
+
+    if args.create_key:
+        create_authkey(args.key_file)
+        return
+    authkey = load_authkey(args.key_file)
+    if authkey is None:
+        sys.exit(f"No key: set POSE_SERVER_AUTHKEY or create {args.key_file} "
+                 f"(python inference_server.py --create-key). Refusing to start.")
+
+    from model_loader import LazyPoseModel
+    model = LazyPoseModel(args.weights, imgsz=args.imgsz, export_format=args.export_format, device=args.device)
+    model.warm_up(background=False)
+    model.timer.report()
+    server = InferenceServer(model, authkey, args.address, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
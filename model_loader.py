@@ -0,0 +1,150 @@
+#scanner start-up: deferred ultralytics import, cached exported model, background warm-up
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from spool import atomic_write_bytes
+
+class StartupTimer:
+    """Wall-clock time of each start-up phase, measured from process start"""
+    def __init__(self):
+        self.start = time.time()
+        self.phases = []  # (name, started at, seconds)
+        self.lock = threading.Lock()
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        phase_start = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, phase_start - self.start, time.time() - phase_start))
+
+    def mark(self, name):
+        """A point in time without duration, e.g. the first processed frame"""
+        with self.lock:
+            self.phases.append((name, time.time() - self.start, 0.0))
+
+    def report(self):
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+            self.reported = True
+        print("Startup phases:")
+        for name, started, seconds in phases:
+            duration = f"{seconds:.2f}s" if seconds else "-"
+            print(f"  +{started:6.2f}s  {name:<24} {duration}")
+
+class LazyPoseModel:
+    """
+    Stands in for YOLO(weights): ultralytics (and torch) are imported and the
+    model is loaded on first use, or earlier by warm_up() in a background
+    thread while the cameras connect. With export_format the model is
+    exported once (fused, e.g. "onnx" or "openvino") into cache_dir and the
+    cached artifact is loaded on later starts; it is rebuilt when the weights
+    change. Calls block until loading has finished.
+    """
+    def __init__(self, weights="yolo11s-pose.pt", imgsz=640, export_format=None, dynamic=True,
+                 cache_dir="model_cache", device=None, timer=None):
+        self.weights = weights
+        self.imgsz = imgsz
+        self.export_format = export_format
+        self.dynamic = dynamic  # Exported models accept other sizes (crops, tiles) only when dynamic
+        self.cache_dir = cache_dir
+        self.device = device
+        self.timer = timer or StartupTimer()
+        self.model = None
+        self.lock = threading.Lock()
+        self.warm_thread = None
+
+    def _cache_key(self):
+        stem = os.path.splitext(os.path.basename(self.weights))[0]
+        return f"{stem}_{self.export_format}_{self.imgsz}{'_dynamic' if self.dynamic else ''}"
+
+    def _cached_artifact(self, YOLO):
+        """Path of the exported model, exporting it first if the cache is missing or stale"""
+        manifest_path = os.path.join(self.cache_dir, self._cache_key() + ".json")
+        weights_mtime = os.path.getmtime(self.weights) if os.path.exists(self.weights) else None
+        try:
+            with open(manifest_path, 'r') as file:
+                manifest = json.load(file)
+            if manifest["weights_mtime"] == weights_mtime and os.path.exists(manifest["artifact"]):
+                return manifest["artifact"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with self.timer.phase(f"export {self.export_format}"):
+            exported = YOLO(self.weights).export(format=self.export_format, imgsz=self.imgsz,
+                                                 dynamic=self.dynamic)
+            destination = os.path.join(self.cache_dir, self._cache_key(), os.path.basename(exported))
+            if os.path.exists(destination):
+                shutil.rmtree(destination) if os.path.isdir(destination) else os.remove(destination)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(exported, destination)
+        # Manifest last: an interrupted export is redone on the next start
+        atomic_write_bytes(manifest_path, json.dumps({"artifact": destination, "weights": self.weights,
+                                                      "weights_mtime": weights_mtime}).encode('utf-8'))
+        return destination
+
+    def load(self):
+        """Import ultralytics and load the model (once); returns the YOLO object"""
+        with self.lock:
+            if self.model is not None:
+                return self.model
+            with self.timer.phase("import ultralytics"):
+                from ultralytics import YOLO
+            if self.export_format:
+                try:
+                    artifact = self._cached_artifact(YOLO)
+                    with self.timer.phase("load cached model"):
+                        model = YOLO(artifact, task="pose")
+                except Exception as e:
+                    print(f"Could not use exported {self.export_format} model, loading {self.weights}: {e}")
+                    artifact = None
+            if not self.export_format or artifact is None:
+                with self.timer.phase("load weights"):
+                    model = YOLO(self.weights)
+                    if self.device is not None:
+                        model.to(self.device)
+            self.model = model
+            return model
+
+    def warm_up(self, background=True):
+        """
+        Load the model and run one inference at the configured size, so the
+        first real frame does not pay for lazy initialisation. Returns the
+        thread when run in the background.
+        """
+        def run():
+            try:
+                model = self.load()
+                import numpy as np
+                with self.timer.phase("warm-up inference"):
+                    model(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8), imgsz=self.imgsz,
+                          verbose=False)
+            except Exception as e:
+                print(f"Model warm-up failed: {e}")
+        if not background:
+            run()
+            return None
+        self.warm_thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+        self.warm_thread.start()
+        return self.warm_thread
+
+    def to(self, device):
+        self.device = device
+        if self.model is not None and not self.export_format:
+            self.model.to(device)
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Anything else (predict, names, ...) goes to the loaded model
+        if name in ("model", "lock"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
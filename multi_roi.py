@@ -0,0 +1,176 @@
+#multi-ROI pose inference: all regions of a frame in one batch, results in frame coordinates
+import numpy as np
+import json
+import os
+
+class ROI:
+    """Rectangle (x_start, y_start, x_end, y_end) or polygon [[x, y], ...] in frame pixels"""
+    def __init__(self, name, rect=None, polygon=None):
+        if polygon is not None:
+            self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+            x1, y1 = self.polygon.min(axis=0)
+            x2, y2 = self.polygon.max(axis=0)
+            rect = (int(x1), int(y1), int(np.ceil(x2)), int(np.ceil(y2)))
+        else:
+            self.polygon = None
+        if rect is None:
+            raise ValueError(f"ROI {name} needs a rect or a polygon")
+        self.name = name
+        self.rect = tuple(int(v) for v in rect)
+
+    def clipped_rect(self, frame_shape):
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = self.rect
+        return max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+
+    def contains(self, points):
+        """Which (N, 2) points lie inside the ROI"""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if self.polygon is None:
+            x1, y1, x2, y2 = self.rect
+            return ((points[:, 0] >= x1) & (points[:, 0] < x2) &
+                    (points[:, 1] >= y1) & (points[:, 1] < y2))
+        return points_in_polygon(points, self.polygon)
+
+def points_in_polygon(points, polygon):
+    """Vectorised even-odd ray casting"""
+    x = points[:, 0][:, None]
+    y = points[:, 1][:, None]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+def load_roi_config(config_file):
+    """
+    Per-camera ROIs from JSON:
+    {"rtsp://...": [{"name": "bench", "rect": [500, 100, 1400, 1080]},
+                    {"name": "door", "polygon": [[850, 50], [1020, 50], [1020, 220]]}]}
+    """
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file, 'r') as file:
+        raw = json.load(file)
+    return {camera: [ROI(r.get("name", f"ROI {i + 1}"), rect=r.get("rect"), polygon=r.get("polygon"))
+                     for i, r in enumerate(rois)]
+            for camera, rois in raw.items()}
+
+def box_iou(box, boxes, containment=False):
+    """
+    IoU of one box against (N, 4) boxes. With containment=True the overlap is
+    measured against the smaller box instead, so a person cut off at one ROI's
+    edge still matches the full detection from a neighbouring ROI.
+    """
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    iou = intersection / np.maximum(area + areas - intersection, 1e-6)
+    if containment:
+        iou = np.maximum(iou, intersection / np.maximum(np.minimum(area, areas), 1e-6))
+    return iou
+
+def nms(boxes, scores, iou_threshold=0.5, containment=False, groups=None):
+    """
+    Indices of the boxes kept by greedy non-maximum suppression. With groups,
+    boxes only suppress boxes from other groups (the model already ran NMS
+    inside each crop).
+    """
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        overlap = box_iou(boxes[best], boxes[order[1:]], containment)
+        if groups is not None:
+            overlap = np.where(groups[order[1:]] == groups[best], 0.0, overlap)
+        order = order[1:][overlap <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+def empty_detections(num_keypoints=17):
+    return {
+        "boxes": np.zeros((0, 4), dtype=np.float32),
+        "scores": np.zeros((0,), dtype=np.float32),
+        "keypoints": np.zeros((0, num_keypoints, 2), dtype=np.float32),
+        "keypoint_conf": np.zeros((0, num_keypoints), dtype=np.float32),
+        "roi_index": np.zeros((0,), dtype=np.int64),
+    }
+
+def result_to_detections(result, offset_x, offset_y, roi_index):
+    """Ultralytics pose result of one crop -> detection arrays in frame coordinates"""
+    boxes = result.boxes.xyxy.cpu().numpy().astype(np.float32)
+    if len(boxes) == 0:
+        return None
+    scores = result.boxes.conf.cpu().numpy().astype(np.float32)
+    keypoints = result.keypoints.xy.cpu().numpy().astype(np.float32)
+    if result.keypoints.conf is not None:
+        keypoint_conf = result.keypoints.conf.cpu().numpy().astype(np.float32)
+    else:
+        keypoint_conf = np.ones(keypoints.shape[:2], dtype=np.float32)
+
+    boxes[:, [0, 2]] += offset_x
+    boxes[:, [1, 3]] += offset_y
+    # (0, 0) marks a missing keypoint and must stay that way
+    present = (keypoints[..., 0] > 0) | (keypoints[..., 1] > 0)
+    keypoints[..., 0] += np.where(present, offset_x, 0)
+    keypoints[..., 1] += np.where(present, offset_y, 0)
+    return {
+        "boxes": boxes,
+        "scores": scores,
+        "keypoints": keypoints,
+        "keypoint_conf": keypoint_conf,
+        "roi_index": np.full(len(boxes), roi_index, dtype=np.int64),
+    }
+
+def concat_detections(parts):
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return empty_detections()
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+def select_detections(detections, index):
+    return {key: value[index] for key, value in detections.items()}
+
+def infer_rois(model, frame, rois, confidence_threshold=0.5, iou_threshold=0.5, imgsz=640):
+    """
+    Run the pose model once on the crops of all ROIs and return one set of
+    detections in frame coordinates. Crops are views into the frame; nothing
+    is written back. People seen by overlapping ROIs are kept once.
+    """
+    crops, offsets = [], []
+    for roi_index, roi in enumerate(rois):
+        x1, y1, x2, y2 = roi.clipped_rect(frame.shape)
+        if x2 <= x1 or y2 <= y1:
+            continue
+        crops.append(frame[y1:y2, x1:x2])
+        offsets.append((x1, y1, roi_index))
+    if not crops:
+        return empty_detections()
+
+    results = model(crops, conf=confidence_threshold, imgsz=imgsz, verbose=False)
+
+    parts = []
+    for result, (offset_x, offset_y, roi_index) in zip(results, offsets):
+        part = result_to_detections(result, offset_x, offset_y, roi_index)
+        if part is None:
+            continue
+        # Polygon ROIs: keep people whose box centre lies inside the polygon
+        if rois[roi_index].polygon is not None:
+            centres = np.stack([(part["boxes"][:, 0] + part["boxes"][:, 2]) / 2,
+                                (part["boxes"][:, 1] + part["boxes"][:, 3]) / 2], axis=1)
+            part = select_detections(part, rois[roi_index].contains(centres))
+        parts.append(part)
+
+    detections = concat_detections(parts)
+    if len(detections["boxes"]) > 1 and len(rois) > 1:
+        keep = nms(detections["boxes"], detections["scores"], iou_threshold,
+                   containment=True, groups=detections["roi_index"])
+        detections = select_detections(detections, keep)
+    return detections
@@ -0,0 +1,259 @@
+#streaming frame pipeline: source -> inference -> keypoint post-processing -> validator -> sinks
+import time
+import queue
+import threading
+import numpy as np
+from multi_roi import infer_rois, result_to_detections, concat_detections
+from tiled_inference import infer_tiled
+from roi_follower import crop_inference_size
+from resource_budget import pin_current_thread
+
+_END = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+class FramePacket:
+    """One frame on its way through the stages; each stage fills in its part"""
+    __slots__ = ("source", "frame", "frame_count", "camera", "timestamp", "offset",
+                 "detections", "keypoints", "keypoint_conf", "flagged", "validations", "info")
+
+    def __init__(self, source, frame, frame_count, camera, timestamp=None):
+        self.source = source
+        self.frame = frame
+        self.frame_count = frame_count
+        self.camera = camera  # Settings in force when the frame was read
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.offset = (0, 0)  # Top-left of the processing area in the frame
+        self.detections = None  # Processing-area coordinates
+        self.keypoints = None  # Frame coordinates
+        self.keypoint_conf = None
+        self.flagged = []  # Indices of people that match the violation
+        self.validations = []  # Per-person results, same layout as validate_pose_positions
+        self.info = {}  # Anything sinks want to show (time left, saved file, ...)
+
+class Stage:
+    """
+    A per-frame function used as a generator stage. fn(packet) returns the
+    packet, or None to drop it. Time spent inside fn is added up per stage,
+    so a slow stage shows up even when the stages run in parallel.
+    """
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.dropped = 0
+        self.seconds = 0.0
+
+    def __call__(self, packets):
+        for packet in packets:
+            start = time.perf_counter()
+            packet = self.fn(packet)
+            self.seconds += time.perf_counter() - start
+            self.frames += 1
+            if packet is None:
+                self.dropped += 1
+                continue
+            yield packet
+
+    def summary(self):
+        return {"frames": self.frames, "dropped": self.dropped,
+                "avg_ms": round(self.seconds * 1000 / self.frames, 2) if self.frames else 0.0}
+
+def threaded(packets, maxsize=4, name="stage", cores=None):
+    """
+    Run an upstream generator in its own thread and hand its packets over a
+    bounded queue. The upstream gets at most maxsize packets ahead; a slow
+    consumer blocks it instead of piling up frames. Errors are re-raised in
+    the consumer, and closing this generator stops the thread after the
+    packet it is working on. With cores the thread is pinned to those CPUs.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        pin_current_thread(cores)
+        try:
+            for packet in packets:
+                if not put(packet):
+                    break
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            # The upstream is only ever touched from this thread
+            if hasattr(packets, "close"):
+                packets.close()
+            put(_END)
+
+    thread = threading.Thread(target=pump, name=f"pipeline-{name}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+class Pipeline:
+    """
+    Chain of stages fed by a frame source. With threads=True the source and
+    every stage but the last run in their own thread, joined by bounded
+    queues of queue_size packets; the last stage runs in the caller's thread
+    (OpenCV windows must stay on the main thread). cores maps thread names
+    ("source" or a stage name) to the CPUs they may run on, see
+    resource_budget.py.
+    """
+    def __init__(self, stages, threads=True, queue_size=4, cores=None):
+        self.stages = list(stages)
+        self.threads = threads
+        self.queue_size = queue_size
+        self.cores = cores or {}
+
+    def run(self, source):
+        packets = source
+        chain = [packets]
+        if self.threads:
+            packets = threaded(packets, self.queue_size, "source", self.cores.get("source"))
+            chain.append(packets)
+        for i, stage in enumerate(self.stages):
+            packets = stage(packets)
+            chain.append(packets)
+            if self.threads and i < len(self.stages) - 1:
+                packets = threaded(packets, self.queue_size, stage.name, self.cores.get(stage.name))
+                chain.append(packets)
+        try:
+            yield from packets
+        finally:
+            # Outermost first: each queue stops and joins its thread before the stage behind it
+            for generator in reversed(chain):
+                generator.close()
+
+    def summary(self):
+        return {stage.name: stage.summary() for stage in self.stages}
+
+def benchmark_stages(packets, stages):
+    """
+    Time each stage on its own: a stage runs over all packets before the
+    next one starts, so no stage waits on or competes with another. Feed it
+    frames recorded from a source, e.g. list(itertools.islice(source, 200)).
+    """
+    packets = list(packets)
+    results = {}
+    for stage in stages:
+        stage.reset()
+        start = time.perf_counter()
+        packets = list(stage(packets))
+        elapsed = time.perf_counter() - start
+        results[stage.name] = dict(stage.summary(), fps=round(stage.frames / elapsed, 1) if elapsed else 0.0)
+    return results
+
+def capture_frames(cap, source, get_camera, switch_after=False, stop=None):
+    """
+    Frame source: read an open capture until the stream ends or stop is set.
+    get_camera() is asked for the settings on every frame, so a hot-reloaded
+    config applies from the next frame on. With switch_after the source
+    also ends after the camera's switch_interval.
+    """
+    start_time = time.time()
+    frame_count = 0
+    while stop is None or not stop.is_set():
+        camera = get_camera()
+        elapsed_time = time.time() - start_time
+        if switch_after and elapsed_time >= camera.switch_interval:
+            print(f"\nTime's up for {source}. Switching to next...")
+            return
+
+        # Sampling rate: skip frames without retrieving them
+        for _ in range(camera.sample_every - 1):
+            cap.grab()
+
+        ret, frame = cap.read()
+        if not ret:
+            print(f"No more frames from {source} (end of video or stream disconnected)")
+            return
+        packet = FramePacket(source, frame, frame_count, camera)
+        if switch_after:
+            packet.info["time_left"] = max(0, camera.switch_interval - elapsed_time)
+        frame_count += 1
+        yield packet
+
+def detect_poses(model, region, camera, follower=None):
+    """
+    Pose detections (boxes, keypoints, keypoint_conf) in region coordinates.
+    With a follower, frames between full scans only run on padded crops
+    around the people already found, and every person gets a track_ids entry.
+    """
+    inference_start = time.time()
+    crops = follower.regions(region.shape) if follower is not None else None
+    if crops:
+        detections = infer_rois(model, region, crops, camera.conf,
+                                imgsz=crop_inference_size(crops, camera.imgsz))
+    elif camera.tile_size:
+        # Overlapping tiles in one batch keep small, distant people at full resolution
+        detections = infer_tiled(model, region, camera.tile_size, camera.tile_overlap,
+                                 confidence_threshold=camera.conf, imgsz=camera.imgsz)
+    else:
+        results = model(region, conf=camera.conf, imgsz=camera.imgsz)
+        detections = concat_detections([result_to_detections(result, 0, 0, 0) for result in results])
+    if follower is not None:
+        detections["track_ids"] = follower.update(detections["boxes"], not crops, region.shape, crops,
+                                                  (time.time() - inference_start) * 1000)
+    return detections
+
+def inference_stage(model, follower=None):
+    """Pose model on the camera's processing area (or crops around tracked people)"""
+    def infer(packet):
+        camera = packet.camera
+        height, width = packet.frame.shape[:2]
+        start_x, start_y, end_x, end_y = camera.roi_pixels(width, height)
+        packet.offset = (start_x, start_y)
+        if follower is not None:
+            follower.full_scan_every = camera.full_scan_every
+        packet.detections = detect_poses(model, packet.frame[start_y:end_y, start_x:end_x], camera, follower)
+        return packet
+    return Stage("inference", infer)
+
+def keypoint_stage():
+    """Keypoints from processing-area to frame coordinates; missing (0, 0) joints stay (0, 0)"""
+    def adjust(packet):
+        start_x, start_y = packet.offset
+        keypoints = np.array(packet.detections["keypoints"], dtype=np.float32)
+        # Same rule as multi_roi.result_to_detections: only present joints move
+        present = (keypoints[..., 0] > 0) | (keypoints[..., 1] > 0)
+        keypoints[..., 0] += np.where(present, start_x, 0)
+        keypoints[..., 1] += np.where(present, start_y, 0)
+        packet.keypoints = keypoints
+        packet.keypoint_conf = packet.detections["keypoint_conf"]
+        return packet
+    return Stage("keypoints", adjust)
+
+def validation_stage():
+    """Flag people with the camera's violation plan; each person stops at the first failed check"""
+    def validate(packet):
+        flagged, evaluation = packet.camera.violation_plan.evaluate(packet.keypoints, packet.keypoint_conf)
+        packet.flagged = [int(i) for i in np.flatnonzero(flagged)]
+        packet.validations = [evaluation.results(i) for i in range(len(evaluation))]
+        return packet
+    return Stage("validation", validate)
+
+def pose_stages(model, follower=None):
+    """inference -> keypoint post-processing -> validator; add sinks after these"""
+    return [inference_stage(model, follower), keypoint_stage(), validation_stage()]
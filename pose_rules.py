@@ -0,0 +1,366 @@
+#pose rules engine: declarative joint/range rules compiled into vectorised NumPy checks
+import numpy as np
+from functools import lru_cache
+
+# Reference levels: shoulders are 0%, hips are 100% of the vertical reference range
+SHOULDER_POINTS = [5, 6]
+HIP_POINTS = [11, 12]
+
+# Rule kinds
+VERTICAL = "vertical"              # Joint height as % of the reference range
+SHOULDER_WIDTH = "shoulder_width"  # Horizontal shoulder distance as % of the reference range
+
+# Keypoints the model is less sure of than this count as missing (occluded joints
+# otherwise land on plausible positions and pass the checks)
+DEFAULT_MIN_KEYPOINT_CONF = 0.5
+
+MISSING_REFERENCE = "Missing reference keypoints"
+INVALID_REFERENCE = "Invalid reference range"
+
+def vertical_rule(name, joint, low, high, horizontal=False, enabled=True, min_conf=None):
+    """
+    Joint must sit between low% and high%; horizontal also requires it between
+    the shoulders. min_conf overrides the rule set's minimum keypoint confidence.
+    """
+    rule = {"name": name, "kind": VERTICAL, "joint": joint, "range": (low, high),
+            "horizontal": horizontal, "enabled": enabled}
+    if min_conf is not None:
+        rule["min_conf"] = min_conf
+    return rule
+
+def shoulder_width_rule(max_percent, name="shoulders"):
+    """Shoulders at most max_percent apart (people seen from the side or back)"""
+    return {"name": name, "kind": SHOULDER_WIDTH, "range": (0, max_percent), "enabled": True}
+
+def _as_array(values):
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values, dtype=np.float32)
+
+def as_keypoint_array(keypoints, num_joints=17, confidences=None):
+    """
+    (N, K, 2) keypoints and (N, K) confidences (or None) from one person or
+    many, as lists, NumPy arrays or torch tensors. (x, y, conf) triples as in
+    result.keypoints.data are split. Tensors are copied off the device once,
+    not per element.
+    """
+    keypoints = _as_array(keypoints)
+    if keypoints.size == 0:
+        return np.zeros((0, num_joints, 2), dtype=np.float32), None
+    if keypoints.ndim == 2:
+        keypoints = keypoints[None]
+    if keypoints.shape[2] == 3:
+        if confidences is None:
+            confidences = keypoints[..., 2]
+        keypoints = keypoints[..., :2]
+    if confidences is not None:
+        confidences = _as_array(confidences).reshape(keypoints.shape[:2])
+    if keypoints.shape[1] < num_joints:
+        # Missing joints are (0, 0), the same as undetected ones
+        missing = num_joints - keypoints.shape[1]
+        keypoints = np.concatenate([keypoints, np.zeros((keypoints.shape[0], missing, 2), dtype=np.float32)], axis=1)
+        if confidences is not None:
+            confidences = np.concatenate([confidences, np.zeros((keypoints.shape[0], missing), dtype=np.float32)], axis=1)
+    return keypoints, confidences
+
+class PoseRules:
+    """
+    A compiled rule set. evaluate() checks every rule for every person at once.
+    When keypoint confidences are given, joints below their minimum confidence
+    count as missing and the shoulder and hip levels are confidence-weighted.
+    """
+    def __init__(self, rules, min_keypoint_conf=DEFAULT_MIN_KEYPOINT_CONF, joint_min_conf=None):
+        self.rules = [dict(rule) for rule in rules]
+        self.names = [rule["name"] for rule in self.rules]
+        kinds = [rule["kind"] for rule in self.rules]
+        unknown = set(kinds) - {VERTICAL, SHOULDER_WIDTH}
+        if unknown:
+            raise ValueError(f"Unknown pose rule kind(s): {sorted(unknown)}")
+
+        self.vertical_index = np.array([i for i, kind in enumerate(kinds) if kind == VERTICAL], dtype=np.int64)
+        self.vertical_joints = np.array([self.rules[i]["joint"] for i in self.vertical_index], dtype=np.int64)
+        self.low = np.array([rule["range"][0] for rule in self.rules], dtype=np.float32)
+        self.high = np.array([rule["range"][1] for rule in self.rules], dtype=np.float32)
+        self.enabled = np.array([rule.get("enabled", True) for rule in self.rules], dtype=bool)
+        self.horizontal = np.array([rule.get("horizontal", False) for rule in self.rules], dtype=bool)
+        self.num_joints = max([17] + [int(j) + 1 for j in self.vertical_joints])
+        self.joint_min_conf = np.full(self.num_joints, min_keypoint_conf, dtype=np.float32)
+        for joint, min_conf in (joint_min_conf or {}).items():
+            self.joint_min_conf[joint] = min_conf
+        for rule in self.rules:
+            if "min_conf" in rule:
+                self.joint_min_conf[rule["joint"]] = rule["min_conf"]
+
+    def prepare(self, keypoints, confidences=None):
+        """
+        Reference levels of all people (cheap, shared by every rule) and an
+        empty PoseEvaluation; rule columns are filled in by compute().
+        """
+        kpts, conf = as_keypoint_array(keypoints, self.num_joints, confidences)
+        x, y = kpts[..., 0], kpts[..., 1]
+        present = (x > 0) & (y > 0)  # NaN compares False, so it counts as missing
+        if conf is not None:
+            present &= conf >= self.joint_min_conf
+            weights = np.where(present, conf, 0.0)
+        else:
+            weights = present.astype(np.float32)
+
+        shoulders_seen = present[:, SHOULDER_POINTS]
+        hips_seen = present[:, HIP_POINTS]
+        shoulder_weights = weights[:, SHOULDER_POINTS]
+        hip_weights = weights[:, HIP_POINTS]
+        shoulder_y = ((np.where(shoulders_seen, y[:, SHOULDER_POINTS], 0) * shoulder_weights).sum(axis=1)
+                      / np.maximum(shoulder_weights.sum(axis=1), 1e-6))
+        hip_y = ((np.where(hips_seen, y[:, HIP_POINTS], 0) * hip_weights).sum(axis=1)
+                 / np.maximum(hip_weights.sum(axis=1), 1e-6))
+        reference = hip_y - shoulder_y
+        has_reference = shoulders_seen.any(axis=1) & hips_seen.any(axis=1)
+        reference_ok = has_reference & (reference > 0)
+
+        evaluation = PoseEvaluation(self, len(kpts), has_reference, reference_ok)
+        evaluation.x, evaluation.y, evaluation.present = x, y, present
+        evaluation.shoulder_y = shoulder_y
+        evaluation.safe_reference = np.where(reference_ok, reference, 1.0)
+        evaluation.shoulder_left_x = np.where(shoulders_seen, x[:, SHOULDER_POINTS], np.inf).min(axis=1)
+        evaluation.shoulder_right_x = np.where(shoulders_seen, x[:, SHOULDER_POINTS], -np.inf).max(axis=1)
+        return evaluation
+
+    def compute(self, evaluation, rule_indices=None, persons=None):
+        """Fill in the given rule columns for the given people (default: all of both)"""
+        e = evaluation
+        rules = np.arange(len(self.rules)) if rule_indices is None else np.asarray(rule_indices, dtype=np.int64)
+        persons = np.arange(len(e)) if persons is None else np.asarray(persons, dtype=np.int64)
+        if not rules.size or not persons.size:
+            return e
+        cells = np.ix_(persons, rules)
+        reference_ok = e.reference_ok[persons][:, None]
+        safe_reference = e.safe_reference[persons][:, None]
+
+        kinds_vertical = np.isin(rules, self.vertical_index)
+        joints = np.array([self.rules[r].get("joint", 0) for r in rules], dtype=np.int64)
+        y = e.y[np.ix_(persons, joints)]
+        x = e.x[np.ix_(persons, joints)]
+        vertical = (y - e.shoulder_y[persons][:, None]) / safe_reference * 100
+        width = (e.shoulder_right_x[persons] - e.shoulder_left_x[persons])[:, None] / safe_reference * 100
+        values = np.where(kinds_vertical, vertical, width)
+        measured = reference_ok & np.where(kinds_vertical, e.present[np.ix_(persons, joints)], True)
+        measured &= self.enabled[rules]
+        between = (x >= e.shoulder_left_x[persons][:, None]) & (x <= e.shoulder_right_x[persons][:, None])
+        horizontal_valid = np.where(kinds_vertical & self.horizontal[rules], between, True) & measured
+
+        values = np.where(measured, values, 0.0)
+        in_range = (values >= self.low[rules]) & (values <= self.high[rules])
+        e.values[cells] = values
+        e.measured[cells] = measured
+        e.in_range[cells] = in_range
+        e.horizontal_valid[cells] = horizontal_valid
+        e.valid[cells] = measured & in_range & np.where(kinds_vertical & self.horizontal[rules], between, True)
+        e.computed[cells] = True
+        return e
+
+    def evaluate(self, keypoints, confidences=None):
+        """Check every rule for every person; returns a PoseEvaluation of (N, rules) arrays"""
+        return self.compute(self.prepare(keypoints, confidences))
+
+    def validate(self, person_kpts, person_conf=None):
+        """Result dict of one person, keyed by rule name"""
+        return self.evaluate(person_kpts, person_conf).results(0)
+
+    def validate_all(self, keypoints, confidences=None):
+        """Result dicts of every person"""
+        evaluation = self.evaluate(keypoints, confidences)
+        return [evaluation.results(i) for i in range(len(evaluation))]
+
+class PoseEvaluation:
+    """Per-person, per-rule arrays; results() renders the dicts the drawing code expects"""
+    def __init__(self, rule_set, count, has_reference, reference_ok):
+        shape = (count, len(rule_set.rules))
+        self.rule_set = rule_set
+        self.values = np.zeros(shape, dtype=np.float32)
+        self.measured = np.zeros(shape, dtype=bool)
+        self.in_range = np.zeros(shape, dtype=bool)
+        self.horizontal_valid = np.zeros(shape, dtype=bool)
+        self.valid = np.zeros(shape, dtype=bool)
+        self.computed = np.zeros(shape, dtype=bool)  # Rules skipped by a plan stay False
+        self.has_reference = has_reference
+        self.reference_ok = reference_ok
+
+    def __len__(self):
+        return len(self.values)
+
+    def _message(self, i, r, rule):
+        if not self.has_reference[i]:
+            return MISSING_REFERENCE
+        if not self.reference_ok[i]:
+            return INVALID_REFERENCE
+        if not self.measured[i, r]:
+            return ""
+        if self.valid[i, r]:
+            return "Valid"
+        value = self.values[i, r]
+        low, high = rule["range"]
+        if rule["kind"] == SHOULDER_WIDTH:
+            return f"Shoulder distance {value:.1f}% outside range [{low}, {high}]"
+        messages = []
+        if not self.in_range[i, r]:
+            messages.append(f"vertical position {value:.1f}% outside range [{low}, {high}]")
+        if not self.horizontal_valid[i, r]:
+            messages.append("horizontal position outside shoulder boundaries")
+        return ", ".join(messages)
+
+    def results(self, i):
+        results = {}
+        for r, rule in enumerate(self.rule_set.rules):
+            entry = {"valid": bool(self.valid[i, r]), "measured": bool(self.measured[i, r])}
+            if rule["kind"] == SHOULDER_WIDTH:
+                entry["horizontal_distance"] = float(self.values[i, r])
+            else:
+                entry["vertical_percent"] = float(self.values[i, r])
+                if rule.get("horizontal"):
+                    entry["horizontal_valid"] = bool(self.horizontal_valid[i, r])
+            entry["message"] = self._message(i, r, rule)
+            results[rule["name"]] = entry
+        return results
+
+def wrist_rules(min_percent, max_percent, wrist_type="both", max_shoulder_percent=None, horizontal=False):
+    """Wrist height rules ("left" is keypoint 10, "right" keypoint 9) plus an optional shoulder width rule"""
+    rules = [vertical_rule("left", 10, min_percent, max_percent, horizontal,
+                           enabled=wrist_type in ("left", "both")),
+             vertical_rule("right", 9, min_percent, max_percent, horizontal,
+                           enabled=wrist_type in ("right", "both"))]
+    if max_shoulder_percent is not None:
+        rules.append(shoulder_width_rule(max_shoulder_percent))
+    return rules
+
+def pose_position_rules(min_wrist_percent, max_wrist_percent,
+                        min_elbow_percent, max_elbow_percent,
+                        min_knee_percent, max_knee_percent,
+                        wrist_type="both", max_shoulder_percent=30):
+    """Wrists, shoulder width, elbows and knees, as checked by the RTSP scanner"""
+    return wrist_rules(min_wrist_percent, max_wrist_percent, wrist_type, max_shoulder_percent) + [
+        vertical_rule("left_elbow", 7, min_elbow_percent, max_elbow_percent),
+        vertical_rule("right_elbow", 8, min_elbow_percent, max_elbow_percent),
+        vertical_rule("left_knee", 13, min_knee_percent, max_knee_percent),
+        vertical_rule("right_knee", 14, min_knee_percent, max_knee_percent),
+    ]
+
+def parse_condition(condition, names):
+    """
+    Condition as data -> list of clauses (AND of ORs), each a list of rule indices.
+    A condition is a rule name, {"all": [conditions]} or {"any": [rule names]}:
+      {"all": ["shoulders", "left", "right", {"any": ["left_elbow", "right_elbow"]}]}
+    """
+    def index(name):
+        if name not in names:
+            raise ValueError(f"Condition refers to unknown rule {name!r}")
+        return names.index(name)
+
+    def any_of(condition):
+        if isinstance(condition, str):
+            return [index(condition)]
+        if isinstance(condition, dict) and list(condition) == ["any"]:
+            return [i for item in condition["any"] for i in any_of(item)]
+        raise ValueError(f"Only rule names can appear inside 'any': {condition!r}")
+
+    if isinstance(condition, dict) and list(condition) == ["all"]:
+        return [clause for item in condition["all"] for clause in parse_condition(item, names)]
+    return [any_of(condition)]
+
+class PosePlan:
+    """
+    A condition compiled into an evaluation plan. Clauses run one at a time
+    over the people still in play, so a person is dropped by the first
+    clause they fail and the remaining rules are never computed for them;
+    once nobody is left the batch stops. The clause order is re-ranked from
+    observed pass rates: cheap clauses that reject most people go first.
+    """
+    def __init__(self, rule_set, condition, reorder_every=100):
+        self.rule_set = rule_set
+        self.condition = condition
+        self.clauses = parse_condition(condition, rule_set.names)
+        self.order = list(range(len(self.clauses)))
+        self.reorder_every = reorder_every
+        self.batches = 0
+        self.checked = [2] * len(self.clauses)  # Prior pass rate of 1/2
+        self.passed = [1] * len(self.clauses)
+
+    def _rank(self, clause_index):
+        # Expected cost per rejected person: rules computed / chance of rejecting
+        pass_rate = self.passed[clause_index] / self.checked[clause_index]
+        return len(self.clauses[clause_index]) / max(1.0 - pass_rate, 0.01)
+
+    def evaluate(self, keypoints, confidences=None):
+        """(flags, evaluation): which people meet the condition, and the rules computed on the way"""
+        evaluation = self.rule_set.prepare(keypoints, confidences)
+        active = evaluation.reference_ok.copy()  # Every rule fails without reference levels
+        for clause_index in self.order:
+            persons = np.flatnonzero(active)
+            if not persons.size:
+                break
+            clause = self.clauses[clause_index]
+            self.rule_set.compute(evaluation, clause, persons)
+            passed = evaluation.valid[np.ix_(persons, clause)].any(axis=1)
+            self.checked[clause_index] += persons.size
+            self.passed[clause_index] += int(passed.sum())
+            active[persons] = passed
+
+        self.batches += 1
+        if self.batches % self.reorder_every == 0:
+            self.order.sort(key=self._rank)
+        return active, evaluation
+
+def compile_violation(rules, condition, min_keypoint_conf=DEFAULT_MIN_KEYPOINT_CONF):
+    return PosePlan(PoseRules(rules, min_keypoint_conf), condition)
+
+def zipping_violation(min_wrist_percent, max_wrist_percent,
+                      min_elbow_percent, max_elbow_percent,
+                      min_knee_percent, max_knee_percent,
+                      wrist_type="both", max_shoulder_percent=30,
+                      min_keypoint_conf=DEFAULT_MIN_KEYPOINT_CONF):
+    """
+    The RTSP scanner's flag: narrow shoulders AND wrist(s) in range AND any
+    elbow in range AND any knee in range
+    """
+    wrists = {"both": ["left", "right"], "left": ["left"], "right": ["right"]}[wrist_type]
+    condition = {"all": ["shoulders"] + wrists + [{"any": ["left_elbow", "right_elbow"]},
+                                                  {"any": ["left_knee", "right_knee"]}]}
+    return compile_violation(pose_position_rules(min_wrist_percent, max_wrist_percent,
+                                                 min_elbow_percent, max_elbow_percent,
+                                                 min_knee_percent, max_knee_percent,
+                                                 wrist_type, max_shoulder_percent),
+                             condition, min_keypoint_conf)
+
+# Violation types by name; each builder takes the camera's threshold settings
+VIOLATIONS = {
+    "zipping": zipping_violation,
+}
+
+# Compiled rule sets are cached, so the per-person wrappers below cost one dict lookup
+@lru_cache(maxsize=64)
+def wrist_rule_set(min_percent, max_percent, wrist_type="both", max_shoulder_percent=None, horizontal=False):
+    return PoseRules(wrist_rules(min_percent, max_percent, wrist_type, max_shoulder_percent, horizontal))
+
+@lru_cache(maxsize=64)
+def pose_position_rule_set(*args, **kwargs):
+    return PoseRules(pose_position_rules(*args, **kwargs))
+
+def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both", max_shoulder_percent=30,
+                            keypoint_conf=None):
+    """Wrist heights and shoulder width of one person"""
+    return wrist_rule_set(min_percent, max_percent, wrist_type, max_shoulder_percent).validate(
+        person_kpts, keypoint_conf)
+
+def validate_wrist_horizontal(person_kpts, min_percent, max_percent, wrist_type="both", keypoint_conf=None):
+    """Wrist heights of one person, with the wrists also required to be between the shoulders"""
+    return wrist_rule_set(min_percent, max_percent, wrist_type, None, True).validate(person_kpts, keypoint_conf)
+
+def validate_pose_positions(person_kpts,
+                            min_wrist_percent, max_wrist_percent,
+                            min_elbow_percent, max_elbow_percent,
+                            min_knee_percent, max_knee_percent,
+                            wrist_type="both", max_shoulder_percent=30, keypoint_conf=None):
+    """Wrists, elbows, knees and shoulder width of one person"""
+    return pose_position_rule_set(min_wrist_percent, max_wrist_percent,
+                                  min_elbow_percent, max_elbow_percent,
+                                  min_knee_percent, max_knee_percent,
+                                  wrist_type, max_shoulder_percent).validate(person_kpts, keypoint_conf)
@@ -0,0 +1,227 @@
+#explicit thread budgets and core pinning for decode, inference and JPEG encode
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from contextlib import closing
+
+class ResourceBudget:
+    """
+    Threads and CPUs of one scanner process, split by pipeline stage:
+    decode (capture thread + FFmpeg decoder threads), inference (torch
+    intra-op threads) and encode (JPEG writers + OpenCV's pool). cores=None
+    leaves that stage unpinned.
+    """
+    def __init__(self, inference_threads=1, decode_threads=1, encode_threads=1,
+                 inference_cores=None, decode_cores=None, encode_cores=None):
+        self.inference_threads = inference_threads
+        self.decode_threads = decode_threads
+        self.encode_threads = encode_threads
+        self.inference_cores = inference_cores
+        self.decode_cores = decode_cores
+        self.encode_cores = encode_cores
+
+    def apply(self):
+        apply_budget(self)
+        return self
+
+    def stage_cores(self):
+        """Pipeline thread name -> CPUs (see pipeline.Pipeline)"""
+        return {"source": self.decode_cores, "inference": self.inference_cores,
+                "keypoints": self.decode_cores, "validation": self.decode_cores,
+                "evidence": self.encode_cores, "annotations": self.encode_cores}
+
+    def __repr__(self):
+        return (f"ResourceBudget(inference={self.inference_threads}@{self.inference_cores}, "
+                f"decode={self.decode_threads}@{self.decode_cores}, "
+                f"encode={self.encode_threads}@{self.encode_cores})")
+
+def available_cores():
+    """CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def pin_current_thread(cores):
+    """
+    Restrict the calling thread (and threads it starts later) to cores.
+    Linux only; elsewhere, or with no cores, nothing happens.
+    """
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(0, cores)  # pid 0 = the calling thread on Linux
+        return True
+    except OSError as e:
+        print(f"Could not pin {threading.current_thread().name} to cores {cores}: {e}")
+        return False
+
+def apply_budget(budget):
+    """
+    Size the thread pools of the libraries. The environment variables only
+    reach libraries that are not loaded yet, so call this before the model
+    is loaded (loading is lazy, see model_loader.py); torch is resized
+    directly if it is already imported.
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(budget.inference_threads)
+    # Read by OpenCV's FFmpeg backend whenever a capture is opened
+    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"threads;{budget.decode_threads}"
+    import cv2
+    cv2.setNumThreads(budget.encode_threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(budget.inference_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Only allowed before the first parallel work
+
+def plan_budgets(processes, inference_threads, decode_threads=1, encode_threads=1, cores=None):
+    """
+    One budget per scanner process, each on its own slice of CPUs. With too
+    few CPUs the slices wrap round and share cores.
+    """
+    cores = cores or available_cores()
+    per_process = inference_threads + decode_threads + encode_threads
+    budgets = []
+    for i in range(processes):
+        slot = [cores[(i * per_process + j) % len(cores)] for j in range(per_process)]
+        budgets.append(ResourceBudget(inference_threads, decode_threads, encode_threads,
+                                      inference_cores=slot[:inference_threads],
+                                      decode_cores=slot[inference_threads:inference_threads + decode_threads],
+                                      encode_cores=slot[inference_threads + decode_threads:]))
+    return budgets
+
+def candidate_splits(processes, cores=None):
+    """(inference, decode, encode) thread splits worth trying for this many processes"""
+    total = len(cores or available_cores())
+    per_process = max(3, total // max(1, processes))
+    splits = []
+    for decode_threads in (1, 2):
+        for encode_threads in (1, 2):
+            inference_threads = 1
+            while inference_threads + decode_threads + encode_threads <= per_process:
+                splits.append((inference_threads, decode_threads, encode_threads))
+                inference_threads *= 2
+            if not any(split[1:] == (decode_threads, encode_threads) for split in splits):
+                splits.append((1, decode_threads, encode_threads))  # Oversubscribed, still worth a look
+    return splits
+
+def _run_scanner(budget, video, weights, imgsz, seconds, encode_every, barrier, results):
+    """Benchmark process: one camera's pipeline on a looping video under a budget"""
+    if budget is not None:
+        budget.apply()
+        pin_current_thread(budget.encode_cores)  # The last stage runs on this thread
+    import cv2
+    from model_loader import LazyPoseModel
+    from camera_config import CameraConfig
+    from frame_writer import encode_jpeg
+    from pipeline import Pipeline, Stage, capture_frames, pose_stages
+
+    model = LazyPoseModel(weights, imgsz=imgsz)
+    model.warm_up(background=False)
+    camera = CameraConfig(imgsz=imgsz)
+    stop = threading.Event()
+
+    def frames():
+        while not stop.is_set():
+            cap = cv2.VideoCapture(video)
+            if not cap.isOpened():
+                print(f"Could not open {video}")
+                return
+            try:
+                yield from capture_frames(cap, video, lambda: camera, stop=stop)
+            finally:
+                cap.release()
+
+    def encode(packet):
+        # Stand-in for saving evidence: the JPEG encoder competes for the CPU like in production
+        if packet.frame_count % encode_every == 0:
+            encode_jpeg(packet.frame)
+        return packet
+
+    pipeline = Pipeline(pose_stages(model) + [Stage("encode", encode)],
+                        cores=budget.stage_cores() if budget is not None else None)
+    barrier.wait(timeout=600)  # All processes start measuring together
+    start = time.time()
+    frame_count = 0
+    packets = pipeline.run(frames())
+    with closing(packets):
+        for packet in packets:
+            frame_count += 1
+            if time.time() - start >= seconds:
+                break
+    stop.set()
+    if not frame_count:
+        print("No frames processed")  # Counted as a failed scanner process, not as 0 fps
+        return
+    results.put((frame_count / (time.time() - start), pipeline.summary()))
+
+def benchmark_budgets(video, cameras, weights="yolo11s-pose.pt", imgsz=640, seconds=30,
+                      encode_every=10, splits=None, include_default=True):
+    """
+    Run one scanner process per camera on the same video for every thread
+    split and report the total frames per second. The default entry leaves
+    all libraries at their own thread counts (every core per process) for
+    comparison. Returns rows sorted best first; empty if no split completed.
+    """
+    context = multiprocessing.get_context("spawn")
+    candidates = [("default", None)] if include_default else []
+    for split in splits or candidate_splits(cameras):
+        candidates.append((f"{split[0]} inference / {split[1]} decode / {split[2]} encode",
+                           plan_budgets(cameras, *split)))
+
+    rows = []
+    for label, budgets in candidates:
+        print(f"\n=== {cameras} cameras, {label} ===")
+        barrier = context.Barrier(cameras)
+        results = context.Queue()
+        processes = [context.Process(target=_run_scanner,
+                                     args=(budgets[i] if budgets else None, video, weights, imgsz,
+                                           seconds, encode_every, barrier, results))
+                     for i in range(cameras)]
+        for process in processes:
+            process.start()
+        reports = []
+        while len(reports) < cameras:
+            try:
+                reports.append(results.get(timeout=5))
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+        for process in processes:
+            process.join()
+        if len(reports) < cameras:
+            print(f"{cameras - len(reports)} scanner processes failed, skipping this split")
+            continue
+        total_fps = sum(fps for fps, _ in reports)
+        inference_ms = [stages["inference"]["avg_ms"] for _, stages in reports]
+        row = {"split": label, "total_fps": round(total_fps, 1),
+               "per_camera_fps": round(total_fps / cameras, 1),
+               "avg_inference_ms": round(sum(inference_ms) / len(inference_ms), 1)}
+        print(row)
+        rows.append(row)
+
+    if not rows:
+        print(f"\nNo split completed for {cameras} cameras: every scanner process failed "
+              f"(check the video path {video} and the weights {weights})")
+        return rows
+    rows.sort(key=lambda row: -row["total_fps"])
+    print(f"\nBest split for {cameras} cameras on {len(available_cores())} cores: {rows[0]['split']} "
+          f"({rows[0]['total_fps']} fps total)")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the best thread split for a number of cameras")
+    parser.add_argument("video", help="Sample recording from one of the cameras")
+    parser.add_argument("--cameras", type=int, default=4, help="Scanner processes running at once")
+    parser.add_argument("--weights", default="yolo11s-pose.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--seconds", type=int, default=30)
+    args = parser.parse_args()
+    if not benchmark_budgets(args.video, args.cameras, args.weights, args.imgsz, args.seconds):
+        sys.exit(1)
@@ -0,0 +1,130 @@
+#detection-guided crops: after a full scan, infer only around the people already found
+import numpy as np
+from multi_roi import ROI, box_iou
+
+class Track:
+    def __init__(self, box, track_id):
+        self.box = np.asarray(box, dtype=np.float32)
+        self.track_id = track_id
+        self.missed = 0  # Consecutive frames without a matching detection
+
+class ROIFollower:
+    """
+    Decides per frame whether to scan the whole processing area or only
+    padded crops around tracked people. A full scan happens every
+    full_scan_every frames, whenever a track is lost, and whenever the
+    crops would cover most of the area anyway.
+    """
+    def __init__(self, full_scan_every=15, padding=0.5, min_size=160, max_missed=2,
+                 max_area_fraction=0.6, match_iou=0.2):
+        self.full_scan_every = full_scan_every
+        self.padding = padding
+        self.min_size = min_size
+        self.max_missed = max_missed
+        self.max_area_fraction = max_area_fraction
+        self.match_iou = match_iou
+        self.tracks = []
+        self.next_track_id = 1
+        self.frames_since_full = None  # None = next frame must be a full scan
+        self.stats = {"frames": 0, "full_scans": 0, "pixels": 0, "full_pixels": 0, "inference_ms": 0.0}
+
+    def _padded(self, box, width, height):
+        x1, y1, x2, y2 = box
+        pad_x = max((x2 - x1) * self.padding, (self.min_size - (x2 - x1)) / 2, 0)
+        pad_y = max((y2 - y1) * self.padding, (self.min_size - (y2 - y1)) / 2, 0)
+        return [max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                min(width, int(np.ceil(x2 + pad_x))), min(height, int(np.ceil(y2 + pad_y)))]
+
+    def regions(self, image_shape):
+        """Crops to run on this frame as ROI objects, or None for a full scan"""
+        if (not self.full_scan_every or not self.tracks or self.frames_since_full is None
+                or self.frames_since_full >= self.full_scan_every):
+            return None
+        height, width = image_shape[:2]
+        rects = [self._padded(track.box, width, height) for track in self.tracks]
+
+        # Merge overlapping crops so nobody is inferred twice
+        merged = True
+        while merged and len(rects) > 1:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rects)
+        if area > self.max_area_fraction * width * height:
+            return None
+        return [ROI(f"track {i + 1}", rect=rect) for i, rect in enumerate(rects)]
+
+    def update(self, boxes, full_scan, image_shape, regions=None, inference_ms=0.0):
+        """
+        Feed the detections (frame coordinates) of the frame just processed.
+        Returns the track id of every box; a person keeps their id from frame
+        to frame, across full scans too, for as long as they are followed.
+        """
+        height, width = image_shape[:2]
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.stats["frames"] += 1
+        self.stats["inference_ms"] += inference_ms
+        self.stats["full_pixels"] += width * height
+        if full_scan:
+            self.stats["full_scans"] += 1
+            self.stats["pixels"] += width * height
+        else:
+            self.stats["pixels"] += sum((r.rect[2] - r.rect[0]) * (r.rect[3] - r.rect[1]) for r in regions or [])
+            self.frames_since_full += 1
+
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        unmatched = list(range(len(boxes)))
+        tracks = []
+        lost = False
+        for track in self.tracks:
+            if unmatched:
+                overlap = box_iou(track.box, boxes[unmatched])
+                best = int(np.argmax(overlap))
+                if overlap[best] >= self.match_iou:
+                    index = unmatched.pop(best)
+                    track.box = boxes[index]
+                    track.missed = 0
+                    track_ids[index] = track.track_id
+                    tracks.append(track)
+                    continue
+            if full_scan:
+                continue  # A full scan sees everyone, so this person has left
+            track.missed += 1
+            lost = lost or track.missed > self.max_missed
+            if track.missed <= self.max_missed:
+                tracks.append(track)
+        # Someone walking into a crop is picked up right away
+        for index in unmatched:
+            track = Track(boxes[index], self.next_track_id)
+            self.next_track_id += 1
+            track_ids[index] = track.track_id
+            tracks.append(track)
+        self.tracks = tracks
+        if full_scan:
+            self.frames_since_full = 0
+        elif lost:
+            self.frames_since_full = None
+        return track_ids
+
+    def summary(self):
+        """Share of full-area pixels actually sent to the model and mean inference time"""
+        stats = dict(self.stats)
+        if stats["full_pixels"]:
+            stats["pixel_fraction"] = round(stats["pixels"] / stats["full_pixels"], 3)
+        if stats["frames"]:
+            stats["avg_inference_ms"] = round(stats["inference_ms"] / stats["frames"], 1)
+        return stats
+
+def crop_inference_size(regions, imgsz, stride=32):
+    """Smallest stride multiple that fits the largest crop, capped at imgsz"""
+    longest = max(max(r.rect[2] - r.rect[0], r.rect[3] - r.rect[1]) for r in regions)
+    return int(min(imgsz, max(stride, -(-longest // stride) * stride)))
@@ -0,0 +1,86 @@
+#camera recording by stream copy: ffmpeg remuxes the original H.264/H.265 packets into segments
+import os
+import json
+import time
+import shutil
+import subprocess
+
+RECORD_ANNOTATED = "annotated"  # Re-encode the annotated frames with cv2.VideoWriter (old behaviour)
+RECORD_COPY = "copy"            # Remux the camera stream untouched; annotations go to a sidecar
+
+class SegmentRecorder:
+    """
+    One ffmpeg process per camera that copies the stream into fixed-length
+    segment files named after their start time. Nothing is decoded, so a
+    recording costs almost no CPU. It opens its own connection to the
+    camera, next to the one the scanner reads from.
+    """
+    def __init__(self, source, output_dir, segment_seconds=60, ffmpeg="ffmpeg"):
+        self.source = source
+        self.output_dir = output_dir
+        self.segment_seconds = segment_seconds
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.process = None
+        self.log_file = None
+        self.started_at = None
+
+    def start(self):
+        """Start recording; returns False if ffmpeg is not available"""
+        if self.ffmpeg is None:
+            print("ffmpeg not found; stream-copy recording disabled")
+            return False
+        os.makedirs(self.output_dir, exist_ok=True)
+        command = [self.ffmpeg, "-hide_banner", "-v", "error", "-nostdin"]
+        if self.source.startswith("rtsp://"):
+            command += ["-rtsp_transport", "tcp"]
+        command += ["-i", self.source, "-map", "0:v", "-map", "0:a?", "-c", "copy",
+                    "-f", "segment", "-segment_time", str(self.segment_seconds),
+                    "-segment_format", "mp4", "-reset_timestamps", "1", "-strftime", "1",
+                    # Fragmented MP4 stays playable if the process is killed mid-segment
+                    "-segment_format_options", "movflags=+frag_keyframe+empty_moov+default_base_moof",
+                    os.path.join(self.output_dir, "%Y%m%d_%H%M%S.mp4")]
+        self.log_file = open(os.path.join(self.output_dir, "ffmpeg.log"), "ab")
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, stderr=self.log_file)
+        self.started_at = time.time()
+        print(f"Recording {self.source} to {self.output_dir} (stream copy, {self.segment_seconds}s segments)")
+        return True
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout=5.0):
+        """Let ffmpeg finish the current segment, killing it if it does not exit in time"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()  # ffmpeg closes its outputs cleanly on SIGTERM
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        self.log_file.close()
+        self.log_file = None
+
+class AnnotationLog:
+    """
+    Scan results next to the recorded segments, one JSON line per frame.
+    Lines carry the wall-clock time of the frame; segment files are named
+    by their start time, so a player can line the two up.
+    """
+    def __init__(self, path, source=None, extra=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.write({"type": "start", "time": time.time(), "source": source, **(extra or {})})
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.write({"type": "end", "time": time.time()})
+        self.file.close()
@@ -1,90 +1,6 @@
 from ultralytics import YOLO
 import numpy as np
-
-def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both", max_shoulder_percent=30):
-    """
-    Validate if wrists are within specified vertical percentage range and shoulder width
-    """
-    validation_results = {
-        "left": {"valid": False, "vertical_percent": 0, "message": ""},
-        "right": {"valid": False, "vertical_percent": 0, "message": ""},
-        "shoulders": {"valid": False, "horizontal_distance": 0, "message": ""}
-    }
-    
-    # Calculate reference levels
-    shoulder_ref_points = [5, 6]
-    hip_ref_points = [11, 12]
-    
-    # Calculate average Y for shoulders (0% reference)
-    shoulder_y_values = []
-    shoulder_x_values = []
-    for kpt_idx in shoulder_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            shoulder_y_values.append(person_kpts[kpt_idx][1].cpu().numpy())
-            shoulder_x_values.append(person_kpts[kpt_idx][0].cpu().numpy())
-    
-    # Calculate average Y for hips (100% reference)
-    hip_y_values = []
-    for kpt_idx in hip_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            hip_y_values.append(person_kpts[kpt_idx][1].cpu().numpy())
-    
-    if not shoulder_y_values or not hip_y_values:
-        validation_results["left"]["message"] = "Missing reference keypoints"
-        validation_results["right"]["message"] = "Missing reference keypoints"
-        validation_results["shoulders"]["message"] = "Missing reference keypoints"
-        return validation_results
-    
-    shoulder_avg_y = np.mean(shoulder_y_values)
-    hip_avg_y = np.mean(hip_y_values)
-    reference_range = hip_avg_y - shoulder_avg_y
-    
-    # Get shoulder x positions and calculate horizontal distance
-    left_shoulder_x = min(shoulder_x_values)
-    right_shoulder_x = max(shoulder_x_values)
-    shoulder_horizontal_distance = right_shoulder_x - left_shoulder_x
-    
-    # Validate shoulder horizontal distance
-    shoulder_percent = (shoulder_horizontal_distance / reference_range) * 100
-    validation_results["shoulders"]["horizontal_distance"] = shoulder_percent
-    validation_results["shoulders"]["valid"] = 0 <= shoulder_percent <= max_shoulder_percent
-    
-    if not validation_results["shoulders"]["valid"]:
-        validation_results["shoulders"]["message"] = f"Shoulder distance {shoulder_percent:.1f}% outside range [0, {max_shoulder_percent}]"
-    else:
-        validation_results["shoulders"]["message"] = "Valid"
-    
-    # Validate left wrist (keypoint 10) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["left", "both"] and len(person_kpts) > 10:
-        left_wrist = person_kpts[10]
-        if left_wrist[0] > 0 and left_wrist[1] > 0:
-            wrist_y = left_wrist[1].cpu().numpy()
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["left"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["left"]["valid"] = vertical_valid
-            
-            validation_results["left"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    # Validate right wrist (keypoint 9) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["right", "both"] and len(person_kpts) > 9:
-        right_wrist = person_kpts[9]
-        if right_wrist[0] > 0 and right_wrist[1] > 0:
-            wrist_y = right_wrist[1].cpu().numpy()
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["right"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["right"]["valid"] = vertical_valid
-            
-            validation_results["right"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    return validation_results
+from pose_rules import validate_wrist_position
 
 def analyze_pose_results(results, min_percent=20, max_percent=40, wrist_type="both", max_shoulder_percent=30):
     """
@@ -96,6 +12,7 @@ def analyze_pose_results(results, min_percent=20, max_percent=40, wrist_type="bo
         xy = result.keypoints.xy
         xyn = result.keypoints.xyn
         kpts = result.keypoints.data
+        keypoint_conf = result.keypoints.conf  # None if the model has no visibility output
         
         print(f"\n{'='*50}")
         print(f"Results for detection {i}:")
@@ -113,7 +30,8 @@ def analyze_pose_results(results, min_percent=20, max_percent=40, wrist_type="bo
                 min_percent, 
                 max_percent,
                 wrist_type=wrist_type,
-                max_shoulder_percent=max_shoulder_percent
+                max_shoulder_percent=max_shoulder_percent,
+                keypoint_conf=keypoint_conf[person_idx] if keypoint_conf is not None else None
             )
             
             # Calculate reference levels for reporting
@@ -0,0 +1,170 @@
+#spool hand-off protocol between the detector (producer) and VLM verifiers (consumers)
+#
+# Layout of a spool folder (e.g. zipping_pose):
+#   <spool>/x.jpg.tmp     being written, never picked up
+#   <spool>/x.json        sidecar, published before its image
+#   <spool>/x.jpg         published item, ready to be claimed
+#   <spool>/claimed/x.jpg claimed by a verifier; the file mtime is the lease start
+#
+# Publishing is "write temp, then os.replace", claiming is an os.rename into
+# claimed/, so exactly one worker wins each item. A worker that dies leaves its
+# claim behind; once the lease expires any worker moves it back to the spool.
+# Items go back the way a producer publishes them: sidecar first, then image.
+import os
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+TEMP_SUFFIX = ".tmp"
+CLAIMED_DIR = "claimed"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+
+def atomic_write_bytes(path, data):
+    """Write data to a temp file next to path and rename it into place"""
+    tmp_path = f"{path}{TEMP_SUFFIX}"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def _sidecar_name(name):
+    return os.path.splitext(name)[0] + ".json"
+
+def _move_sidecar(src_dir, dst_dir, name):
+    try:
+        os.rename(os.path.join(src_dir, _sidecar_name(name)), os.path.join(dst_dir, _sidecar_name(name)))
+    except FileNotFoundError:
+        pass
+
+def _return_to_spool(claimed_dir, spool_dir, name):
+    """
+    Move a claimed item back to the spool, sidecar before image. The image is
+    first renamed to a private temp name, so no other worker can complete,
+    reclaim or claim it halfway. False if the image was already gone.
+    """
+    staged = os.path.join(claimed_dir, f"{name}.{default_worker_id()}-{threading.get_ident()}{TEMP_SUFFIX}")
+    try:
+        os.rename(os.path.join(claimed_dir, name), staged)
+    except FileNotFoundError:
+        return False
+    _move_sidecar(claimed_dir, spool_dir, name)
+    os.replace(staged, os.path.join(spool_dir, name))
+    return True
+
+class Claim:
+    """An item claimed by one worker"""
+    def __init__(self, spool_dir, name, worker_id):
+        self.spool_dir = spool_dir
+        self.name = name
+        self.worker_id = worker_id
+        self.claimed_at = time.time()
+
+    @property
+    def claimed_dir(self):
+        return os.path.join(self.spool_dir, CLAIMED_DIR)
+
+    @property
+    def path(self):
+        return os.path.join(self.claimed_dir, self.name)
+
+    @property
+    def sidecar(self):
+        path = os.path.join(self.claimed_dir, _sidecar_name(self.name))
+        return path if os.path.exists(path) else None
+
+def list_ready(spool_dir):
+    """Published items that are waiting to be claimed"""
+    try:
+        names = os.listdir(spool_dir)
+    except FileNotFoundError:
+        return []
+    return [n for n in names
+            if n.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(spool_dir, n))]
+
+def try_claim(spool_dir, name, worker_id=None):
+    """Claim one item; returns a Claim or None if another worker got it first"""
+    claimed_dir = os.path.join(spool_dir, CLAIMED_DIR)
+    os.makedirs(claimed_dir, exist_ok=True)
+    src = os.path.join(spool_dir, name)
+    try:
+        # Start the lease before the rename so the claimed file never looks expired
+        os.utime(src)
+        os.rename(src, os.path.join(claimed_dir, name))
+    except FileNotFoundError:
+        return None
+    _move_sidecar(spool_dir, claimed_dir, name)
+    return Claim(spool_dir, name, worker_id or default_worker_id())
+
+def claim_next(spool_dir, worker_id=None, names=None):
+    """Claim the first available item, in the given order if names is passed"""
+    for name in (names if names is not None else list_ready(spool_dir)):
+        claim = try_claim(spool_dir, name, worker_id)
+        if claim is not None:
+            return claim
+    return None
+
+def renew(claim):
+    """Extend the lease of a long-running claim; False if the claim was lost"""
+    try:
+        os.utime(claim.path)
+        return True
+    except FileNotFoundError:
+        return False
+
+@contextmanager
+def renewing(claims, interval=60):
+    """Renew the leases of claims every interval seconds while the block runs"""
+    stop = threading.Event()
+
+    def keep_alive():
+        while not stop.wait(interval):
+            for claim in claims:
+                renew(claim)
+
+    thread = threading.Thread(target=keep_alive, name="spool-lease", daemon=True)
+    thread.start()
+    try:
+        yield claims
+    finally:
+        stop.set()
+        thread.join()
+
+def complete(claim, target_folder):
+    """
+    Move a processed item (and its sidecar) out of the spool. Returns False
+    if the claim was lost: the lease expired and another worker reclaimed it.
+    """
+    os.makedirs(target_folder, exist_ok=True)
+    try:
+        os.replace(claim.path, os.path.join(target_folder, claim.name))
+    except FileNotFoundError:
+        return False
+    _move_sidecar(claim.claimed_dir, target_folder, claim.name)
+    return True
+
+def release(claim):
+    """Give an item back to the spool unprocessed; False if the claim was lost"""
+    return _return_to_spool(claim.claimed_dir, claim.spool_dir, claim.name)
+
+def reclaim_expired(spool_dir, lease_seconds=300):
+    """Return claims whose lease ran out (crashed worker) to the spool"""
+    claimed_dir = os.path.join(spool_dir, CLAIMED_DIR)
+    reclaimed = 0
+    now = time.time()
+    for name in list_ready(claimed_dir):
+        path = os.path.join(claimed_dir, name)
+        try:
+            if now - os.path.getmtime(path) < lease_seconds:
+                continue
+        except FileNotFoundError:
+            continue  # Completed or reclaimed by someone else meanwhile
+        if _return_to_spool(claimed_dir, spool_dir, name):
+            reclaimed += 1
+    if reclaimed:
+        print(f"Reclaimed {reclaimed} expired items in {spool_dir}")
+    return reclaimed
@@ -1,103 +1,12 @@
 #this code is combinnation of test3-1.py and spool-1-1.py
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import argparse
 import os
 from pathlib import Path
 from datetime import datetime
-
-def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both", max_shoulder_percent=30):
-    """
-    Validate if wrists are within specified vertical percentage range and shoulder width
-    This function is copied from spool-1-1.py
-    """
-    validation_results = {
-        "left": {"valid": False, "vertical_percent": 0, "message": ""},
-        "right": {"valid": False, "vertical_percent": 0, "message": ""},
-        "shoulders": {"valid": False, "horizontal_distance": 0, "message": ""}
-    }
-    
-    # Calculate reference levels
-    shoulder_ref_points = [5, 6]
-    hip_ref_points = [11, 12]
-    
-    # Calculate average Y for shoulders (0% reference)
-    shoulder_y_values = []
-    shoulder_x_values = []
-    for kpt_idx in shoulder_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            shoulder_y_values.append(person_kpts[kpt_idx][1])
-            shoulder_x_values.append(person_kpts[kpt_idx][0])
-    
-    # Calculate average Y for hips (100% reference)
-    hip_y_values = []
-    for kpt_idx in hip_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            hip_y_values.append(person_kpts[kpt_idx][1])
-    
-    if not shoulder_y_values or not hip_y_values:
-        validation_results["left"]["message"] = "Missing reference keypoints"
-        validation_results["right"]["message"] = "Missing reference keypoints"
-        validation_results["shoulders"]["message"] = "Missing reference keypoints"
-        return validation_results
-    
-    shoulder_avg_y = np.mean(shoulder_y_values)
-    hip_avg_y = np.mean(hip_y_values)
-    reference_range = hip_avg_y - shoulder_avg_y
-    
-    if reference_range <= 0:
-        validation_results["left"]["message"] = "Invalid reference range"
-        validation_results["right"]["message"] = "Invalid reference range"
-        validation_results["shoulders"]["message"] = "Invalid reference range"
-        return validation_results
-    
-    # Get shoulder x positions and calculate horizontal distance
-    left_shoulder_x = min(shoulder_x_values)
-    right_shoulder_x = max(shoulder_x_values)
-    shoulder_horizontal_distance = right_shoulder_x - left_shoulder_x
-    
-    # Validate shoulder horizontal distance
-    shoulder_percent = (shoulder_horizontal_distance / reference_range) * 100
-    validation_results["shoulders"]["horizontal_distance"] = shoulder_percent
-    validation_results["shoulders"]["valid"] = 0 <= shoulder_percent <= max_shoulder_percent
-    
-    if not validation_results["shoulders"]["valid"]:
-        validation_results["shoulders"]["message"] = f"Shoulder distance {shoulder_percent:.1f}% outside range [0, {max_shoulder_percent}]"
-    else:
-        validation_results["shoulders"]["message"] = "Valid"
-    
-    # Validate left wrist (keypoint 10) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["left", "both"] and len(person_kpts) > 10:
-        left_wrist = person_kpts[10]
-        if left_wrist[0] > 0 and left_wrist[1] > 0:
-            wrist_y = left_wrist[1]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["left"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["left"]["valid"] = vertical_valid
-            
-            validation_results["left"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    # Validate right wrist (keypoint 9) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["right", "both"] and len(person_kpts) > 9:
-        right_wrist = person_kpts[9]
-        if right_wrist[0] > 0 and right_wrist[1] > 0:
-            wrist_y = right_wrist[1]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["right"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["right"]["valid"] = vertical_valid
-            
-            validation_results["right"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    return validation_results
+from pose_rules import validate_wrist_position
+from inference_server import pose_model
 
 def setup_video_source(source):
     """Setup video capture based on input source"""
@@ -300,6 +209,7 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
             # Draw pose keypoints on the central region
             for result in results:
                 keypoints = result.keypoints.xy.cpu().numpy()  # x, y coordinates
+                keypoint_conf = result.keypoints.conf.cpu().numpy() if result.keypoints.conf is not None else None
                 
                 # Adjust keypoints coordinates to match the original frame
                 adjusted_keypoints = []
@@ -321,7 +231,8 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
                         min_vertical_percent, 
                         max_vertical_percent,
                         wrist_type=wrist_type,
-                        max_shoulder_percent=max_shoulder_percent
+                        max_shoulder_percent=max_shoulder_percent,
+                        keypoint_conf=keypoint_conf[person_idx] if keypoint_conf is not None else None
                     )
                     
                     frame_validation_results.append(validation_results)
@@ -391,8 +302,8 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
 def process_specific_sources():
     """Process specific sources without command line arguments"""
     
-    # Load model
-    model = YOLO("yolo11s-pose.pt")
+    # Load model (or use the node's shared inference server if it is running)
+    model = pose_model("yolo11s-pose.pt")
     
     # Spool pose validation parameters
     MIN_VERTICAL_PERCENT = -20
@@ -1,5 +1,4 @@
 #this code is combinnation of test3-1.py and spool-1-1.py
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import argparse
@@ -8,98 +7,10 @@ from pathlib import Path
 from datetime import datetime
 import shutil
 import torch
-
-def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both", max_shoulder_percent=30):
-    """
-    Validate if wrists are within specified vertical percentage range and shoulder width
-    This function is copied from spool-1-1.py
-    """
-    validation_results = {
-        "left": {"valid": False, "vertical_percent": 0, "message": ""},
-        "right": {"valid": False, "vertical_percent": 0, "message": ""},
-        "shoulders": {"valid": False, "horizontal_distance": 0, "message": ""}
-    }
-    
-    # Calculate reference levels
-    shoulder_ref_points = [5, 6]
-    hip_ref_points = [11, 12]
-    
-    # Calculate average Y for shoulders (0% reference)
-    shoulder_y_values = []
-    shoulder_x_values = []
-    for kpt_idx in shoulder_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            shoulder_y_values.append(person_kpts[kpt_idx][1])
-            shoulder_x_values.append(person_kpts[kpt_idx][0])
-    
-    # Calculate average Y for hips (100% reference)
-    hip_y_values = []
-    for kpt_idx in hip_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            hip_y_values.append(person_kpts[kpt_idx][1])
-    
-    if not shoulder_y_values or not hip_y_values:
-        validation_results["left"]["message"] = "Missing reference keypoints"
-        validation_results["right"]["message"] = "Missing reference keypoints"
-        validation_results["shoulders"]["message"] = "Missing reference keypoints"
-        return validation_results
-    
-    shoulder_avg_y = np.mean(shoulder_y_values)
-    hip_avg_y = np.mean(hip_y_values)
-    reference_range = hip_avg_y - shoulder_avg_y
-    
-    if reference_range <= 0:
-        validation_results["left"]["message"] = "Invalid reference range"
-        validation_results["right"]["message"] = "Invalid reference range"
-        validation_results["shoulders"]["message"] = "Invalid reference range"
-        return validation_results
-    
-    # Get shoulder x positions and calculate horizontal distance
-    left_shoulder_x = min(shoulder_x_values)
-    right_shoulder_x = max(shoulder_x_values)
-    shoulder_horizontal_distance = right_shoulder_x - left_shoulder_x
-    
-    # Validate shoulder horizontal distance
-    shoulder_percent = (shoulder_horizontal_distance / reference_range) * 100
-    validation_results["shoulders"]["horizontal_distance"] = shoulder_percent
-    validation_results["shoulders"]["valid"] = 0 <= shoulder_percent <= max_shoulder_percent
-    
-    if not validation_results["shoulders"]["valid"]:
-        validation_results["shoulders"]["message"] = f"Shoulder distance {shoulder_percent:.1f}% outside range [0, {max_shoulder_percent}]"
-    else:
-        validation_results["shoulders"]["message"] = "Valid"
-    
-    # Validate left wrist (keypoint 10) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["left", "both"] and len(person_kpts) > 10:
-        left_wrist = person_kpts[10]
-        if left_wrist[0] > 0 and left_wrist[1] > 0:
-            wrist_y = left_wrist[1]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["left"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["left"]["valid"] = vertical_valid
-            
-            validation_results["left"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    # Validate right wrist (keypoint 9) - REMOVED HORIZONTAL VALIDATION
-    if wrist_type in ["right", "both"] and len(person_kpts) > 9:
-        right_wrist = person_kpts[9]
-        if right_wrist[0] > 0 and right_wrist[1] > 0:
-            wrist_y = right_wrist[1]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["right"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            validation_results["right"]["valid"] = vertical_valid
-            
-            validation_results["right"]["message"] = "Valid" if vertical_valid else f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]"
-    
-    return validation_results
+from pose_rules import validate_wrist_position
+from clip_extractor import ClipExtractor
+from inference_server import pose_model
+from video_chunks import probe_frames, estimate_frames, plan_chunks, read_chunk, worker_threads, run_chunks
 
 def setup_video_source(source):
     """Setup video capture based on input source"""
@@ -259,10 +170,65 @@ def save_spool_pose_frame(frame, frame_count, person_id, validation_results, key
     base_filename = f"spool_pose_{timestamp}_frame{frame_count}_person{person_id}"
     return base_filename
 
+def detect_spool_poses(model, frame, confidence_threshold=0.5, min_vertical_percent=-20,
+                       max_vertical_percent=30, wrist_type="both", max_shoulder_percent=20):
+    """
+    Run the model on the central 50% width of the frame and validate every person.
+    Returns (start_x, end_x, keypoints in frame coordinates, validation results,
+    indices of the persons in spool pose).
+    """
+    # Calculate the central 50% width area
+    height, width = frame.shape[:2]
+    start_x = int(width * 0.25)  # 25% from left
+    end_x = int(width * 0.75)    # 75% from left (so width between is 50%)
+    
+    # Extract the central 50% region
+    center_region = frame[:, start_x:end_x]
+    
+    # Perform inference only on the central region
+    results = model(center_region, conf=confidence_threshold, verbose=False)
+    
+    adjusted_keypoints = []
+    frame_validation_results = []
+    spool_persons = []
+    for result in results:
+        keypoints = result.keypoints.xy.cpu().numpy()  # x, y coordinates
+        keypoint_conf = result.keypoints.conf.cpu().numpy() if result.keypoints.conf is not None else None
+        
+        for person_idx, person_kp in enumerate(keypoints):
+            # Adjust x coordinate to account for the offset (NaN stays NaN)
+            person_kpts = np.asarray(person_kp, dtype=np.float32) + np.array([start_x, 0], dtype=np.float32)
+            
+            # Validate wrist positions for this person
+            validation_results = validate_wrist_position(
+                person_kpts, 
+                min_vertical_percent, 
+                max_vertical_percent,
+                wrist_type=wrist_type,
+                max_shoulder_percent=max_shoulder_percent,
+                keypoint_conf=keypoint_conf[person_idx] if keypoint_conf is not None else None
+            )
+            
+            # Check if this is a valid spool pose
+            if (validation_results["shoulders"]["valid"] and 
+                ((wrist_type == "both" and validation_results["left"]["valid"] and validation_results["right"]["valid"]) or
+                 (wrist_type == "left" and validation_results["left"]["valid"]) or
+                 (wrist_type == "right" and validation_results["right"]["valid"]))):
+                spool_persons.append(len(adjusted_keypoints))
+            
+            adjusted_keypoints.append(person_kpts)
+            frame_validation_results.append(validation_results)
+    
+    return start_x, end_x, adjusted_keypoints, frame_validation_results, spool_persons
+
 def process_video(source, output_path, model, confidence_threshold=0.5, 
                   min_vertical_percent=-20, max_vertical_percent=30, 
-                  wrist_type="both", max_shoulder_percent=20):
-    """Process video file and save output with spool pose detection"""
+                  wrist_type="both", max_shoulder_percent=20, clip_extractor=None):
+    """
+    Process video file and save output with spool pose detection.
+    Clips are cut from the file in the background by clip_extractor (a
+    private one if None); every frame is analysed.
+    """
     
     # Setup video capture
     cap = setup_video_source(source)
@@ -271,8 +237,13 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
         print(f"Error: Could not open video source {source}")
         return
     
-    # Get total frames for reference
+    # Get total frames and frame rate for reference
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    
+    own_extractor = clip_extractor is None
+    if own_extractor:
+        clip_extractor = ClipExtractor(fallback=save_spool_pose_clip)
     
     # Create video writer
     #out, frame_width, frame_height, fps = create_video_writer(cap, output_path)
@@ -289,6 +260,7 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
     frame_count = 0
     paused = False
     spool_pose_count = 0
+    last_clip_end = -1  # Detections up to this frame are already covered by a clip
     
     while True:
         if not paused:
@@ -297,72 +269,35 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
                 print("End of video or failed to read frame")
                 break
             
-            # Calculate the central 50% width area
+            # Detect and validate poses in the central 50% width area
             height, width = frame.shape[:2]
-            start_x = int(width * 0.25)  # 25% from left
-            end_x = int(width * 0.75)    # 75% from left (so width between is 50%)
-            
-            # Extract the central 50% region
-            center_region = frame[:, start_x:end_x]
-            
-            # Perform inference only on the central region
-            results = model(center_region, conf=confidence_threshold, verbose=False)
+            start_x, end_x, adjusted_keypoints, frame_validation_results, spool_persons = detect_spool_poses(
+                model, frame, confidence_threshold, min_vertical_percent, max_vertical_percent,
+                wrist_type, max_shoulder_percent)
             
-            # Store validation results for all persons in this frame
-            frame_validation_results = []
-            
-            # Draw pose keypoints on the central region
-            for result in results:
-                keypoints = result.keypoints.xy.cpu().numpy()  # x, y coordinates
-                
-                # Adjust keypoints coordinates to match the original frame
-                adjusted_keypoints = []
-                for person_kp in keypoints:
-                    adjusted_person_kp = []
-                    for x, y in person_kp:
-                        if not np.isnan(x) and not np.isnan(y):
-                            # Adjust x coordinate to account for the offset
-                            adjusted_x = x + start_x
-                            adjusted_person_kp.append([adjusted_x, y])
-                        else:
-                            adjusted_person_kp.append([x, y])
-                    adjusted_keypoints.append(np.array(adjusted_person_kp))
-                
-                # Validate wrist positions for each person
-                for person_idx, person_kpts in enumerate(adjusted_keypoints):
-                    validation_results = validate_wrist_position(
-                        person_kpts, 
-                        min_vertical_percent, 
-                        max_vertical_percent,
-                        wrist_type=wrist_type,
-                        max_shoulder_percent=max_shoulder_percent
-                    )
+            if spool_persons:
+                base_filenames = []
+                for person_idx in spool_persons:
+                    validation_results = frame_validation_results[person_idx]
+                    person_kpts = adjusted_keypoints[person_idx]
                     
-                    frame_validation_results.append(validation_results)
-                    
-                    # Check if this is a valid spool pose and save frame
-                    if (validation_results["shoulders"]["valid"] and 
-                        ((wrist_type == "both" and validation_results["left"]["valid"] and validation_results["right"]["valid"]) or
-                         (wrist_type == "left" and validation_results["left"]["valid"]) or
-                         (wrist_type == "right" and validation_results["right"]["valid"]))):
-                        
-                        base_filename = save_spool_pose_frame(frame, frame_count, person_idx + 1, validation_results, [person_kpts])
-                        spool_pose_count += 1
-                        
-                        # Create video clip: rewind 300 frames and capture 600 frames total
-                        clip_start_frame = max(0, frame_count - 300)
-                        clip_end_frame = min(total_frames - 1, frame_count + 299)  # 600 frames total
-                        
-                        # Save the video clip
-                        save_spool_pose_clip(source, clip_start_frame, clip_end_frame, base_filename)
-                        
-                        # Skip ahead to after the clip
-                        if clip_end_frame < total_frames - 1:
-                            cap.set(cv2.CAP_PROP_POS_FRAMES, clip_end_frame + 1)
-                            frame_count = clip_end_frame
+                    base_filenames.append(save_spool_pose_frame(frame, frame_count, person_idx + 1, validation_results, [person_kpts]))
+                    spool_pose_count += 1
                 
-                # Draw adjusted keypoints and validation results on the original frame
-                draw_pose_keypoints(frame, adjusted_keypoints, frame_validation_results)
+                # Frames inside the last clip window are saved and counted, but get no clip of their own
+                if frame_count > last_clip_end:
+                    # Create video clip: rewind 300 frames and capture 600 frames total
+                    clip_start_frame = max(0, frame_count - 300)
+                    clip_end_frame = frame_count + 299  # 600 frames total
+                    if total_frames > 0:
+                        clip_end_frame = min(total_frames - 1, clip_end_frame)
+                    
+                    # Cut the clip from the file in the background; the scan carries on with the next frame
+                    clip_extractor.submit(source, clip_start_frame, clip_end_frame, fps, base_filenames[0])
+                    last_clip_end = clip_end_frame
+            
+            # Draw adjusted keypoints and validation results on the original frame
+            draw_pose_keypoints(frame, adjusted_keypoints, frame_validation_results)
             
             # Draw a rectangle to visualize the processing area
             cv2.rectangle(frame, (start_x, 0), (end_x, height), (0, 255, 255), 2)
@@ -397,10 +332,100 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
     cap.release()
     #out.release()
     cv2.destroyAllWindows()
+    if own_extractor:
+        clip_extractor.close()
     #print(f"\nProcessing complete! Output saved to: {output_path}")
     print(f"Total frames processed: {frame_count}")
     print(f"Total spool poses detected: {spool_pose_count}")
 
+# Model of a chunk worker process, loaded once by _init_chunk_worker
+_chunk_model = None
+
+def _init_chunk_worker(model_path, device, threads):
+    global _chunk_model
+    torch.set_num_threads(threads)
+    _chunk_model = pose_model(model_path, device=device)
+
+def _scan_chunk(task):
+    """Worker: detect spool poses in one chunk; frames are saved under their global number"""
+    source, chunk, frame_times, settings = task
+    events = []
+    frames_read = 0
+    for frame_number, frame in read_chunk(source, chunk, frame_times):
+        frames_read += 1
+        _, _, adjusted_keypoints, frame_validation_results, spool_persons = detect_spool_poses(
+            _chunk_model, frame, **settings)
+        for person_idx in spool_persons:
+            base_filename = save_spool_pose_frame(frame, frame_number, person_idx + 1,
+                                                  frame_validation_results[person_idx],
+                                                  [adjusted_keypoints[person_idx]])
+            events.append({
+                "frame": frame_number,
+                "time": frame_times[frame_number - chunk.start_frame],  # Seconds into the video
+                "person": person_idx + 1,
+                "base_filename": base_filename
+            })
+    return {"chunk": chunk.index, "frames": frames_read, "events": events}
+
+def process_video_chunked(source, model_path, workers=None, device='cpu', confidence_threshold=0.5,
+                          min_vertical_percent=-20, max_vertical_percent=30,
+                          wrist_type="both", max_shoulder_percent=20, chunks_per_worker=2):
+    """
+    Process one long video file in parallel: split it at keyframes and let
+    worker processes (each with its own model) decode and scan their own
+    range. Events are merged in frame order; clips are cut afterwards with
+    the same 600-frame window as process_video. Returns the merged events.
+    """
+    workers = workers or os.cpu_count() or 1
+    
+    probe = probe_frames(source)
+    if probe is None:
+        print("Falling back to a single sequential chunk")
+        probe = estimate_frames(source)
+    frame_times, keyframe_times = probe
+    total_frames = len(frame_times)
+    chunks = plan_chunks(frame_times, keyframe_times, workers * chunks_per_worker)
+    
+    print(f"Processing video: {source}")
+    print(f"Total frames: {total_frames}, keyframes: {len(keyframe_times)}")
+    print(f"Split into {len(chunks)} chunks for {workers} workers")
+    
+    settings = {
+        "confidence_threshold": confidence_threshold,
+        "min_vertical_percent": min_vertical_percent,
+        "max_vertical_percent": max_vertical_percent,
+        "wrist_type": wrist_type,
+        "max_shoulder_percent": max_shoulder_percent
+    }
+    tasks = [(source, chunk, frame_times[chunk.start_frame:chunk.end_frame], settings) for chunk in chunks]
+    results = run_chunks(_scan_chunk, tasks, min(workers, len(chunks)),
+                         initializer=_init_chunk_worker,
+                         initargs=(model_path, device, worker_threads(workers)))
+    
+    frames_processed = sum(result["frames"] for result in results)
+    events = sorted((event for result in results for event in result["events"]),
+                    key=lambda event: (event["frame"], event["person"]))
+    
+    # One clip per 600-frame window, like the sequential scan
+    duration = frame_times[-1] - frame_times[0]
+    fps = (total_frames - 1) / duration if total_frames > 1 and duration > 0 else 30
+    clip_extractor = ClipExtractor(num_workers=min(workers, 4), fallback=save_spool_pose_clip)
+    last_clip_end = -1
+    for event in events:
+        if event["frame"] <= last_clip_end:
+            event["clip"] = None
+            continue
+        clip_start_frame = max(0, event["frame"] - 300)
+        clip_end_frame = min(total_frames - 1, event["frame"] + 299)
+        clip_extractor.submit(source, clip_start_frame, clip_end_frame, fps, event["base_filename"])
+        event["clip"] = [clip_start_frame, clip_end_frame]
+        last_clip_end = clip_end_frame
+    clip_extractor.close()
+    
+    print(f"Total frames processed: {frames_processed}/{total_frames}")
+    print(f"Total spool poses detected: {len(events)}")
+    return events
+
 # Modified function to process all .mp4 files in a folder
 def process_specific_sources():
     """Process all .mp4 files in a specific folder and move them to processed_files after completion"""
@@ -422,11 +447,13 @@ def process_specific_sources():
         print("CUDA is not available. Using CPU.")
         device = 'cpu'
     
-    # Load model and move to GPU if available
-    model = YOLO("yolo11s-pose.pt")
+    # Parallel workers per file (keyframe-aligned chunks); 1 = sequential with preview window
+    WORKERS = 1
+    MODEL_PATH = "yolo11s-pose.pt"
     
-    # Move model to GPU
-    model.to(device)
+    # Load model on the GPU if available (or use the node's shared inference server if it is running);
+    # chunk workers load their own, so the sequential path is the only user of this one
+    model = pose_model(MODEL_PATH, device=device) if WORKERS <= 1 else None
 
     # Spool pose validation parameters
     MIN_VERTICAL_PERCENT = -20
@@ -467,11 +494,18 @@ def process_specific_sources():
         output_path = os.path.join(input_folder, output_filename)
         
         # Process the video from the processed_files folder
-        process_video(destination_path, output_path, model,
-                     min_vertical_percent=MIN_VERTICAL_PERCENT,
-                     max_vertical_percent=MAX_VERTICAL_PERCENT,
-                     wrist_type=WRIST_TYPE,
-                     max_shoulder_percent=MAX_SHOULDER_PERCENT)
+        if WORKERS > 1:
+            process_video_chunked(destination_path, MODEL_PATH, workers=WORKERS, device=device,
+                                  min_vertical_percent=MIN_VERTICAL_PERCENT,
+                                  max_vertical_percent=MAX_VERTICAL_PERCENT,
+                                  wrist_type=WRIST_TYPE,
+                                  max_shoulder_percent=MAX_SHOULDER_PERCENT)
+        else:
+            process_video(destination_path, output_path, model,
+                         min_vertical_percent=MIN_VERTICAL_PERCENT,
+                         max_vertical_percent=MAX_VERTICAL_PERCENT,
+                         wrist_type=WRIST_TYPE,
+                         max_shoulder_percent=MAX_SHOULDER_PERCENT)
     
     print(f"\n{'='*60}")
     print(f"All files processed successfully!")
@@ -1,117 +1,7 @@
 from ultralytics import YOLO
 import cv2
 import numpy as np
-
-def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both"):
-    """
-    Validate if wrists are within specified vertical percentage range and horizontal position
-    
-    Args:
-        person_kpts: Keypoints for a person
-        min_percent: Minimum allowed vertical percentage
-        max_percent: Maximum allowed vertical percentage  
-        wrist_type: "left", "right", or "both"
-    
-    Returns:
-        dict: Validation results for each wrist
-    """
-    validation_results = {
-        "left": {"valid": False, "vertical_percent": 0, "horizontal_valid": False, "message": ""},
-        "right": {"valid": False, "vertical_percent": 0, "horizontal_valid": False, "message": ""}
-    }
-    
-    # Calculate reference levels
-    shoulder_ref_points = [5, 6]  # Left and right shoulders
-    hip_ref_points = [11, 12]     # Left and right hips
-    
-    # Calculate average Y for shoulders (0% reference)
-    shoulder_y_values = []
-    shoulder_x_values = []
-    for kpt_idx in shoulder_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            shoulder_y_values.append(person_kpts[kpt_idx][1].cpu().numpy())
-            shoulder_x_values.append(person_kpts[kpt_idx][0].cpu().numpy())
-    
-    # Calculate average Y for hips (100% reference)
-    hip_y_values = []
-    for kpt_idx in hip_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            hip_y_values.append(person_kpts[kpt_idx][1].cpu().numpy())
-    
-    if not shoulder_y_values or not hip_y_values:
-        validation_results["left"]["message"] = "Missing reference keypoints"
-        validation_results["right"]["message"] = "Missing reference keypoints"
-        return validation_results
-    
-    shoulder_avg_y = np.mean(shoulder_y_values)
-    hip_avg_y = np.mean(hip_y_values)
-    reference_range = hip_avg_y - shoulder_avg_y
-    
-    # Get shoulder x boundaries
-    left_shoulder_x = min(shoulder_x_values)  # Smaller x = left side
-    right_shoulder_x = max(shoulder_x_values)  # Larger x = right side
-    
-    # Validate left wrist (keypoint 10)
-    if wrist_type in ["left", "both"] and len(person_kpts) > 10:
-        left_wrist = person_kpts[10]
-        if left_wrist[0] > 0 and left_wrist[1] > 0:
-            wrist_y = left_wrist[1].cpu().numpy()
-            wrist_x = left_wrist[0].cpu().numpy()
-            
-            # Calculate vertical percentage
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["left"]["vertical_percent"] = vertical_percent
-            
-            # Check vertical position
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            
-            # Check horizontal position (between shoulders)
-            horizontal_valid = left_shoulder_x <= wrist_x <= right_shoulder_x
-            
-            validation_results["left"]["valid"] = vertical_valid and horizontal_valid
-            validation_results["left"]["horizontal_valid"] = horizontal_valid
-            
-            # Generate message
-            messages = []
-            if not vertical_valid:
-                messages.append(f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]")
-            if not horizontal_valid:
-                messages.append("horizontal position outside shoulder boundaries")
-            
-            validation_results["left"]["message"] = "Valid" if not messages else ", ".join(messages)
-    
-    # Validate right wrist (keypoint 9)
-    if wrist_type in ["right", "both"] and len(person_kpts) > 9:
-        right_wrist = person_kpts[9]
-        if right_wrist[0] > 0 and right_wrist[1] > 0:
-            wrist_y = right_wrist[1].cpu().numpy()
-            wrist_x = right_wrist[0].cpu().numpy()
-            
-            # Calculate vertical percentage
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["right"]["vertical_percent"] = vertical_percent
-            
-            # Check vertical position
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            
-            # Check horizontal position (between shoulders)
-            horizontal_valid = left_shoulder_x <= wrist_x <= right_shoulder_x
-            
-            validation_results["right"]["valid"] = vertical_valid and horizontal_valid
-            validation_results["right"]["horizontal_valid"] = horizontal_valid
-            
-            # Generate message
-            messages = []
-            if not vertical_valid:
-                messages.append(f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]")
-            if not horizontal_valid:
-                messages.append("horizontal position outside shoulder boundaries")
-            
-            validation_results["right"]["message"] = "Valid" if not messages else ", ".join(messages)
-    
-    return validation_results
+from pose_rules import validate_wrist_horizontal
 
 # Load a model
 model = YOLO("yolo11n-pose.pt")  # load an official model
@@ -133,6 +23,7 @@ for i, result in enumerate(results):
     xy = result.keypoints.xy  # x and y coordinates
     xyn = result.keypoints.xyn  # normalized
     kpts = result.keypoints.data  # x, y, visibility (if available)
+    keypoint_conf = result.keypoints.conf  # None if the model has no visibility output
     
     print(f"Results for detection {i}:")
     print(f"Validation Range: Vertical [{MIN_VERTICAL_PERCENT}%, {MAX_VERTICAL_PERCENT}%], Horizontal [between shoulders], Wrist Type: {WRIST_TYPE}")
@@ -169,11 +60,12 @@ for i, result in enumerate(results):
         print(f"\n--- Person {person_idx + 1} Analysis ---")
         
         # Validate wrist positions with updated parameters
-        validation_results = validate_wrist_position(
+        validation_results = validate_wrist_horizontal(
             person_kpts, 
             MIN_VERTICAL_PERCENT, 
             MAX_VERTICAL_PERCENT,
-            wrist_type=WRIST_TYPE
+            wrist_type=WRIST_TYPE,
+            keypoint_conf=keypoint_conf[person_idx] if keypoint_conf is not None else None
         )
         
         # Calculate reference levels for visualization
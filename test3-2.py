@@ -1,14 +1,18 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import argparse
 import os
 from pathlib import Path
+from multi_roi import ROI, infer_rois, load_roi_config
+from inference_server import pose_model
 
 # Define the two ROIs (Region of Interest)
 ROI_1 = (500, 100, 1400, 1080)  # Format: (x_start, y_start, x_end, y_end)
 ROI_2 = (850, 50, 1020, 220)  # Format: (x_start, y_start, x_end, y_end)
 
+# Per-camera ROIs (rectangles or polygons) override the two defaults above
+ROI_CONFIG_FILE = "roi_config.json"
+
 def setup_video_source(source):
     """Setup video capture based on input source"""
     cap = cv2.VideoCapture(source)
@@ -40,18 +44,15 @@ def extract_roi(frame, roi_coords):
     x_start, y_start, x_end, y_end = roi_coords
     return frame[y_start:y_end, x_start:x_end]
 
-def apply_roi_to_frame(frame, processed_roi, roi_coords):
-    """Apply processed ROI back to the original frame"""
-    x_start, y_start, x_end, y_end = roi_coords
-    frame[y_start:y_end, x_start:x_end] = processed_roi
-    return frame
-
-def draw_roi_boundaries(frame, roi_coords, roi_name, color):
+def draw_roi_boundaries(frame, roi_coords, roi_name, color, polygon=None):
     """Draw ROI boundaries and label with coordinates on the frame"""
     x_start, y_start, x_end, y_end = roi_coords
     
-    # Draw rectangle around ROI
-    cv2.rectangle(frame, (x_start, y_start), (x_end, y_end), color, 2)
+    # Draw rectangle (or polygon) around ROI
+    if polygon is not None:
+        cv2.polylines(frame, [polygon.astype(np.int32)], True, color, 2)
+    else:
+        cv2.rectangle(frame, (x_start, y_start), (x_end, y_end), color, 2)
     
     # Draw filled background for text
     text = f"{roi_name}: ({x_start},{y_start})-({x_end},{y_end})"
@@ -109,20 +110,13 @@ def draw_pose_keypoints(image, keypoints):
                 # Add keypoint number
                 #cv2.putText(image, str(i), (point[0] + 10, point[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
 
-def process_roi(roi_frame, model, confidence_threshold=0.5):
-    """Process a single ROI and return the processed frame"""
-    # Perform inference on the ROI
-    results = model(roi_frame, conf=confidence_threshold)
+def process_video_with_rois(source, output_path, model, confidence_threshold=0.5, rois=None):
+    """Process video with several ROIs in one inference batch and combine results into single output"""
     
-    # Draw pose keypoints on the ROI
-    for result in results:
-        keypoints = result.keypoints.xy.cpu().numpy()  # x, y coordinates
-        draw_pose_keypoints(roi_frame, keypoints)
-    
-    return roi_frame
-
-def process_video_with_rois(source, output_path, model, confidence_threshold=0.5):
-    """Process video with two ROIs and combine results into single output"""
+    # ROIs for this camera from the config file, else the two defaults
+    if rois is None:
+        rois = load_roi_config(ROI_CONFIG_FILE).get(str(source)) or [ROI("ROI 1", rect=ROI_1),
+                                                                     ROI("ROI 2", rect=ROI_2)]
     
     # Setup video capture
     cap = setup_video_source(source)
@@ -135,8 +129,8 @@ def process_video_with_rois(source, output_path, model, confidence_threshold=0.5
     out, frame_width, frame_height, fps = create_video_writer(cap, output_path)
     
     print(f"Processing video with ROIs: {source}")
-    print(f"ROI 1: {ROI_1}")
-    print(f"ROI 2: {ROI_2}")
+    for roi in rois:
+        print(f"{roi.name}: {roi.rect}{' (polygon)' if roi.polygon is not None else ''}")
     print(f"Output: {output_path}")
     print(f"Resolution: {frame_width}x{frame_height}, FPS: {fps}")
     print("Press 'q' to quit, 'p' to pause")
@@ -145,8 +139,7 @@ def process_video_with_rois(source, output_path, model, confidence_threshold=0.5
     paused = False
     
     # Define colors for ROI boundaries
-    roi1_color = (0, 255, 0)  # Green for ROI 1
-    roi2_color = (0, 165, 255)  # Orange for ROI 2
+    roi_colors = [(0, 255, 0), (0, 165, 255), (255, 0, 255), (255, 255, 0)]  # Green, orange, ...
     
     while True:
         if not paused:
@@ -155,25 +148,18 @@ def process_video_with_rois(source, output_path, model, confidence_threshold=0.5
                 print("End of video or failed to read frame")
                 break
             
-            # Create a copy of the original frame for processing
-            processed_frame = frame.copy()
-            
-            # Extract ROIs from the frame
-            roi1_frame = extract_roi(processed_frame, ROI_1)
-            roi2_frame = extract_roi(processed_frame, ROI_2)
-            
-            # Process each ROI independently
-            processed_roi1 = process_roi(roi1_frame, model, confidence_threshold)
-            processed_roi2 = process_roi(roi2_frame, model, confidence_threshold)
+            # All ROIs go through the model as one batch; detections come back
+            # in frame coordinates with overlapping duplicates removed
+            detections = infer_rois(model, frame, rois, confidence_threshold)
             
-            # Apply processed ROIs back to the processed frame
-            # ROI_2 is applied last to take precedence in overlapping areas
-            processed_frame = apply_roi_to_frame(processed_frame, processed_roi1, ROI_1)
-            processed_frame = apply_roi_to_frame(processed_frame, processed_roi2, ROI_2)
+            # Draw directly on the frame, no ROI pixels are copied back
+            processed_frame = frame
+            draw_pose_keypoints(processed_frame, detections["keypoints"])
             
             # Draw ROI boundaries and labels on the processed frame
-            draw_roi_boundaries(processed_frame, ROI_1, "ROI 1", roi1_color)
-            draw_roi_boundaries(processed_frame, ROI_2, "ROI 2", roi2_color)
+            for roi_index, roi in enumerate(rois):
+                draw_roi_boundaries(processed_frame, roi.rect, roi.name,
+                                    roi_colors[roi_index % len(roi_colors)], roi.polygon)
             
             # Write processed frame to output video
             out.write(processed_frame)
@@ -206,8 +192,8 @@ def process_video_with_rois(source, output_path, model, confidence_threshold=0.5
 def process_specific_sources():
     """Process specific sources without command line arguments"""
     
-    # Load model
-    model = YOLO("yolo11s-pose.pt")
+    # Load model (or use the node's shared inference server if it is running)
+    model = pose_model("yolo11s-pose.pt")
     
     # Option 1: Process MP4 file with dual ROIs
     # process_video_with_rois(r"D:\Downloads\D24_20250528052000.mp4", "output_video.mp4", model)
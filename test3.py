@@ -1,6 +1,6 @@
+from inference_server import pose_model
 
 #"D:\Downloads\D24_20250528052000.mp4")  # predict on an image
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import argparse
@@ -144,8 +144,8 @@ def process_video(source, output_path, model, confidence_threshold=0.5):
 def process_specific_sources():
     """Process specific sources without command line arguments"""
     
-    # Load model
-    model = YOLO("yolo11s-pose.pt")
+    # Load model (or use the node's shared inference server if it is running)
+    model = pose_model("yolo11s-pose.pt")
     
     # Option 1: Process MP4 file
     # process_video(r"D:\Downloads\D24_20250528052000.mp4", "output_video.mp4", model)
@@ -1,10 +1,11 @@
 #this code is combinnation of test3-1.py and test-1-1.py
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import argparse
 import os
 from pathlib import Path
+from pose_rules import validate_wrist_horizontal
+from inference_server import pose_model
 
 def setup_video_source(source):
     """Setup video capture based on input source"""
@@ -32,103 +33,6 @@ def create_video_writer(cap, output_path, fps=30):
     
     return out, frame_width, frame_height, fps
 
-def validate_wrist_position(person_kpts, min_percent, max_percent, wrist_type="both"):
-    """
-    Validate if wrists are within specified vertical percentage range and horizontal position
-    """
-    validation_results = {
-        "left": {"valid": False, "vertical_percent": 0, "horizontal_valid": False, "message": ""},
-        "right": {"valid": False, "vertical_percent": 0, "horizontal_valid": False, "message": ""}
-    }
-    
-    # Calculate reference levels
-    shoulder_ref_points = [5, 6]
-    hip_ref_points = [11, 12]
-    
-    # Calculate average Y for shoulders (0% reference)
-    shoulder_y_values = []
-    shoulder_x_values = []
-    for kpt_idx in shoulder_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            shoulder_y_values.append(person_kpts[kpt_idx][1])
-            shoulder_x_values.append(person_kpts[kpt_idx][0])
-    
-    # Calculate average Y for hips (100% reference)
-    hip_y_values = []
-    for kpt_idx in hip_ref_points:
-        if (len(person_kpts) > kpt_idx and 
-            person_kpts[kpt_idx][0] > 0 and person_kpts[kpt_idx][1] > 0):
-            hip_y_values.append(person_kpts[kpt_idx][1])
-    
-    if not shoulder_y_values or not hip_y_values:
-        validation_results["left"]["message"] = "Missing reference keypoints"
-        validation_results["right"]["message"] = "Missing reference keypoints"
-        return validation_results
-    
-    shoulder_avg_y = np.mean(shoulder_y_values)
-    hip_avg_y = np.mean(hip_y_values)
-    reference_range = hip_avg_y - shoulder_avg_y
-    
-    if reference_range <= 0:
-        validation_results["left"]["message"] = "Invalid reference range"
-        validation_results["right"]["message"] = "Invalid reference range"
-        return validation_results
-    
-    # Get shoulder x boundaries
-    left_shoulder_x = min(shoulder_x_values)
-    right_shoulder_x = max(shoulder_x_values)
-    
-    # Validate left wrist (keypoint 10)
-    if wrist_type in ["left", "both"] and len(person_kpts) > 10:
-        left_wrist = person_kpts[10]
-        if left_wrist[0] > 0 and left_wrist[1] > 0:
-            wrist_y = left_wrist[1]
-            wrist_x = left_wrist[0]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["left"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            horizontal_valid = left_shoulder_x <= wrist_x <= right_shoulder_x
-            
-            validation_results["left"]["valid"] = vertical_valid and horizontal_valid
-            validation_results["left"]["horizontal_valid"] = horizontal_valid
-            
-            messages = []
-            if not vertical_valid:
-                messages.append(f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]")
-            if not horizontal_valid:
-                messages.append("horizontal position outside shoulder boundaries")
-            
-            validation_results["left"]["message"] = "Valid" if not messages else ", ".join(messages)
-    
-    # Validate right wrist (keypoint 9)
-    if wrist_type in ["right", "both"] and len(person_kpts) > 9:
-        right_wrist = person_kpts[9]
-        if right_wrist[0] > 0 and right_wrist[1] > 0:
-            wrist_y = right_wrist[1]
-            wrist_x = right_wrist[0]
-            
-            vertical_percent = ((wrist_y - shoulder_avg_y) / reference_range) * 100
-            validation_results["right"]["vertical_percent"] = vertical_percent
-            
-            vertical_valid = min_percent <= vertical_percent <= max_percent
-            horizontal_valid = left_shoulder_x <= wrist_x <= right_shoulder_x
-            
-            validation_results["right"]["valid"] = vertical_valid and horizontal_valid
-            validation_results["right"]["horizontal_valid"] = horizontal_valid
-            
-            messages = []
-            if not vertical_valid:
-                messages.append(f"vertical position {vertical_percent:.1f}% outside range [{min_percent}, {max_percent}]")
-            if not horizontal_valid:
-                messages.append("horizontal position outside shoulder boundaries")
-            
-            validation_results["right"]["message"] = "Valid" if not messages else ", ".join(messages)
-    
-    return validation_results
-
 def draw_pose_keypoints(image, keypoints, validation_results=None):
     """Draw pose keypoints and skeleton on image with validation results"""
     # Define the skeleton connections for pose keypoints (COCO 17 keypoints format)
@@ -267,12 +171,13 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
             # Process results and validate wrists
             for result in results:
                 keypoints = result.keypoints.xy.cpu().numpy()  # x, y coordinates
+                keypoint_conf = result.keypoints.conf.cpu().numpy() if result.keypoints.conf is not None else None
                 
                 # Adjust keypoints coordinates to match the original frame
                 adjusted_keypoints = []
                 frame_validation_results = []
                 
-                for person_kp in keypoints:
+                for person_idx, person_kp in enumerate(keypoints):
                     adjusted_person_kp = []
                     person_validation = {"left": {"valid": False}, "right": {"valid": False}}
                     
@@ -288,11 +193,12 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
                     
                     # Validate wrist positions for this person
                     if len(adjusted_person_kp) > 0:
-                        validation = validate_wrist_position(
+                        validation = validate_wrist_horizontal(
                             adjusted_person_kp, 
                             min_vertical_percent, 
                             max_vertical_percent,
-                            wrist_type=wrist_type
+                            wrist_type=wrist_type,
+                            keypoint_conf=keypoint_conf[person_idx] if keypoint_conf is not None else None
                         )
                         frame_validation_results.append(validation)
                         
@@ -365,8 +271,8 @@ def process_video(source, output_path, model, confidence_threshold=0.5,
 def process_specific_sources():
     """Process specific sources without command line arguments"""
     
-    # Load model
-    model = YOLO("yolo11s-pose.pt")
+    # Load model (or use the node's shared inference server if it is running)
+    model = pose_model("yolo11s-pose.pt")
     
     # Wrist validation parameters
     MIN_VERTICAL_PERCENT = 15
@@ -0,0 +1,42 @@
+#keypoint post-processing of the frame pipeline
+import numpy as np
+from camera_config import CameraConfig
+from multi_roi import empty_detections
+from pipeline import FramePacket, keypoint_stage, validation_stage
+
+def packet_with_keypoints(camera, keypoints, frame_shape=(480, 640, 3)):
+    height, width = frame_shape[:2]
+    packet = FramePacket("sim://0", np.zeros(frame_shape, dtype=np.uint8), 0, camera)
+    start_x, start_y, _, _ = camera.roi_pixels(width, height)
+    packet.offset = (start_x, start_y)
+    detections = empty_detections()
+    detections["keypoints"] = np.asarray(keypoints, dtype=np.float32)[None]
+    detections["keypoint_conf"] = np.ones(detections["keypoints"].shape[:2], dtype=np.float32)
+    packet.detections = detections
+    return packet
+
+def test_missing_joint_stays_missing_with_roi_top():
+    camera = CameraConfig(roi_left=0.10, roi_top=0.25, roi_right=0.90, min_keypoint_conf=0.0)
+    keypoints = np.zeros((17, 2), dtype=np.float32)
+    keypoints[5] = [100, 20]
+    keypoints[11] = [100, 120]
+    packet = packet_with_keypoints(camera, keypoints)
+
+    packet = next(keypoint_stage()([packet]))
+
+    assert packet.keypoints[0, 5].tolist() == [164, 140]   # Offset (64, 120) applied
+    assert packet.keypoints[0, 11].tolist() == [164, 240]
+    assert packet.keypoints[0, 9].tolist() == [0, 0]       # Missing wrist is not moved to the ROI corner
+    assert packet.detections["keypoints"][0, 5].tolist() == [100, 20]  # Detections are left alone
+
+def test_missing_joint_is_not_measured_with_low_min_conf():
+    camera = CameraConfig(roi_top=0.25, min_keypoint_conf=0.0)
+    keypoints = np.zeros((17, 2), dtype=np.float32)
+    keypoints[[5, 6]] = [[100, 20], [110, 20]]
+    keypoints[[11, 12]] = [[100, 120], [110, 120]]
+    packet = packet_with_keypoints(camera, keypoints)
+
+    packet = next(validation_stage()(keypoint_stage()([packet])))
+
+    assert packet.validations[0]["left"]["measured"] is False
+    assert packet.flagged == []
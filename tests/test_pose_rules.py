@@ -0,0 +1,141 @@
+#equivalence of pose_rules with the per-script validators it replaced
+import math
+import numpy as np
+import pytest
+from pose_rules import validate_pose_positions, validate_wrist_position, validate_wrist_horizontal
+
+JOINTS = {"left": 10, "right": 9, "left_elbow": 7, "right_elbow": 8, "left_knee": 13, "right_knee": 14}
+
+def legacy_validate(person_kpts, ranges, wrist_type="both", max_shoulder_percent=None, horizontal=False):
+    """
+    The removed copies (suspected_det_scancam, spool*, test4, ...) in one
+    function: ranges maps result keys to (low, high), wrists are checked per
+    wrist_type, the shoulder width only when max_shoulder_percent is given.
+    """
+    results = {name: {"valid": False, "vertical_percent": 0, "message": ""} for name in ranges}
+    if horizontal:
+        for name in ("left", "right"):
+            results[name]["horizontal_valid"] = False
+    if max_shoulder_percent is not None:
+        results["shoulders"] = {"valid": False, "horizontal_distance": 0, "message": ""}
+
+    def seen(i):
+        return len(person_kpts) > i and person_kpts[i][0] > 0 and person_kpts[i][1] > 0
+
+    shoulder_y = [person_kpts[i][1] for i in (5, 6) if seen(i)]
+    shoulder_x = [person_kpts[i][0] for i in (5, 6) if seen(i)]
+    hip_y = [person_kpts[i][1] for i in (11, 12) if seen(i)]
+    if not shoulder_y or not hip_y:
+        for entry in results.values():
+            entry["message"] = "Missing reference keypoints"
+        return results
+    shoulder_avg_y = np.mean(shoulder_y)
+    reference_range = np.mean(hip_y) - shoulder_avg_y
+    if reference_range <= 0:
+        for entry in results.values():
+            entry["message"] = "Invalid reference range"
+        return results
+    left_x, right_x = min(shoulder_x), max(shoulder_x)
+
+    if max_shoulder_percent is not None:
+        percent = (right_x - left_x) / reference_range * 100
+        valid = 0 <= percent <= max_shoulder_percent
+        results["shoulders"] = {"valid": valid, "horizontal_distance": percent,
+                                "message": "Valid" if valid else
+                                f"Shoulder distance {percent:.1f}% outside range [0, {max_shoulder_percent}]"}
+
+    for name, (low, high) in ranges.items():
+        joint = JOINTS[name]
+        if name in ("left", "right") and wrist_type not in (name, "both"):
+            continue
+        if not seen(joint):
+            continue
+        percent = (person_kpts[joint][1] - shoulder_avg_y) / reference_range * 100
+        vertical_valid = low <= percent <= high
+        messages = [] if vertical_valid else [f"vertical position {percent:.1f}% outside range [{low}, {high}]"]
+        valid = vertical_valid
+        if horizontal:
+            horizontal_valid = left_x <= person_kpts[joint][0] <= right_x
+            results[name]["horizontal_valid"] = horizontal_valid
+            if not horizontal_valid:
+                messages.append("horizontal position outside shoulder boundaries")
+            valid = valid and horizontal_valid
+        results[name].update(valid=valid, vertical_percent=percent,
+                             message="Valid" if not messages else ", ".join(messages))
+    return results
+
+def assert_same(new, old):
+    assert set(old) <= set(new)
+    for name, expected in old.items():
+        actual = new[name]
+        assert actual["valid"] == expected["valid"], name
+        assert actual["message"] == expected["message"], name
+        for key in ("vertical_percent", "horizontal_distance"):
+            if key in expected:
+                assert math.isclose(actual[key], expected[key], rel_tol=1e-4, abs_tol=1e-3), name
+        if "horizontal_valid" in expected:
+            assert actual["horizontal_valid"] == expected["horizontal_valid"], name
+
+def person(**joints):
+    """17 keypoints with missing (0, 0) joints except the given ones"""
+    kpts = np.zeros((17, 2), dtype=np.float32)
+    for index, xy in joints.items():
+        kpts[int(index[1:])] = xy
+    return kpts
+
+# Shoulders at y=100, hips at y=300: 1% of the reference range is 2 px
+STANDING = dict(j5=(100, 100), j6=(120, 100), j11=(100, 300), j12=(120, 300))
+
+CASES = {
+    "all joints in range": person(**STANDING, j9=(110, 110), j10=(112, 120), j7=(105, 140), j8=(115, 150),
+                                  j13=(105, 660), j14=(115, 700)),
+    "wrists out of range": person(**STANDING, j9=(110, 200), j10=(140, 60), j7=(105, 170), j8=(115, 150),
+                                  j13=(105, 500), j14=(115, 710)),
+    "wrist outside the shoulders": person(**STANDING, j9=(90, 110), j10=(150, 120)),
+    "missing joints": person(**STANDING, j9=(110, 110)),
+    "one shoulder and one hip": person(j5=(100, 100), j12=(120, 300), j9=(110, 105), j14=(115, 690)),
+    "missing shoulders": person(j11=(100, 300), j12=(120, 300), j9=(110, 110)),
+    "missing hips": person(j5=(100, 100), j6=(120, 100), j9=(110, 110)),
+    "hips above the shoulders": person(j5=(100, 300), j6=(120, 300), j11=(100, 100), j12=(120, 100)),
+    "wide shoulders": person(j5=(50, 100), j6=(200, 100), j11=(60, 300), j12=(190, 300), j9=(100, 110)),
+    "NaN joints": person(**STANDING, j9=(np.nan, np.nan), j10=(112, np.nan), j7=(np.nan, 140)),
+    "NaN shoulders": person(j5=(np.nan, np.nan), j6=(np.nan, 100), j11=(100, 300), j12=(120, 300), j9=(110, 110)),
+    "short keypoint list": person(**STANDING, j9=(110, 110))[:11],
+}
+
+POSE_RANGES = {"left": (-20, 20), "right": (-20, 20), "left_elbow": (0, 30), "right_elbow": (0, 30),
+               "left_knee": (160, 200), "right_knee": (160, 200)}
+WRIST_RANGES = {"left": (-20, 20), "right": (-20, 20)}
+
+@pytest.mark.parametrize("wrist_type", ["both", "left", "right"])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_pose_positions_match_legacy(case, wrist_type):
+    kpts = CASES[case]
+    new = validate_pose_positions(kpts, -20, 20, 0, 30, 160, 200, wrist_type=wrist_type, max_shoulder_percent=10)
+    old = legacy_validate(kpts, POSE_RANGES, wrist_type, max_shoulder_percent=10)
+    assert_same(new, old)
+
+@pytest.mark.parametrize("wrist_type", ["both", "left", "right"])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_wrist_position_matches_legacy(case, wrist_type):
+    kpts = CASES[case]
+    new = validate_wrist_position(kpts, -20, 20, wrist_type=wrist_type, max_shoulder_percent=30)
+    old = legacy_validate(kpts, WRIST_RANGES, wrist_type, max_shoulder_percent=30)
+    assert_same(new, old)
+    assert set(new) == {"left", "right", "shoulders"}
+
+@pytest.mark.parametrize("wrist_type", ["both", "left", "right"])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_wrist_horizontal_matches_legacy(case, wrist_type):
+    kpts = CASES[case]
+    new = validate_wrist_horizontal(kpts, -20, 20, wrist_type=wrist_type)
+    old = legacy_validate(kpts, WRIST_RANGES, wrist_type, horizontal=True)
+    assert_same(new, old)
+    assert set(new) == {"left", "right"}
+
+def test_keypoint_triples_and_lists_match_arrays():
+    kpts = CASES["all joints in range"]
+    triples = np.concatenate([kpts, np.ones((17, 1), dtype=np.float32)], axis=1)
+    expected = validate_pose_positions(kpts, -20, 20, 0, 30, 160, 200)
+    assert validate_pose_positions(triples, -20, 20, 0, 30, 160, 200) == expected
+    assert validate_pose_positions(kpts.tolist(), -20, 20, 0, 30, 160, 200) == expected
@@ -0,0 +1,33 @@
+#chunk planning and frame numbering of video_chunks
+import cv2
+import numpy as np
+import pytest
+from video_chunks import Chunk, estimate_frames, plan_chunks, read_chunk
+
+@pytest.fixture
+def numbered_video(tmp_path):
+    """100 frames at 25 fps; the brightness of frame i is 2 * i"""
+    path = str(tmp_path / "numbered.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("no video encoder available")
+    for i in range(100):
+        writer.write(np.full((48, 64, 3), 2 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_plan_chunks_starts_on_keyframes():
+    frame_times = [i / 25 for i in range(100)]
+    keyframe_times = [i / 25 for i in range(0, 100, 12)]
+    chunks = plan_chunks(frame_times, keyframe_times, 4)
+    assert [chunk.start_frame for chunk in chunks] == [0, 24, 48, 72]
+    assert chunks[-1].end_frame == 100
+    assert chunks[1].start_time == pytest.approx(24 / 25)
+
+def test_read_chunk_numbers_frames_globally(numbered_video):
+    frame_times, _ = estimate_frames(numbered_video)
+    chunk = Chunk(1, 40, 60, frame_times[40], frame_times[59])
+    frames = list(read_chunk(numbered_video, chunk, frame_times[40:60]))
+    assert [number for number, _ in frames] == list(range(40, 60))
+    for number, frame in frames:
+        assert abs(int(frame.mean()) - 2 * number) <= 2
@@ -0,0 +1,99 @@
+#tiled (SAHI-style) pose inference for small, distant people in wide-angle views
+import numpy as np
+from multi_roi import box_iou, concat_detections, empty_detections, result_to_detections, select_detections
+
+# COCO keypoint sigmas (nose, eyes, ears, shoulders, elbows, wrists, hips, knees, ankles)
+COCO_SIGMAS = np.array([0.026, 0.025, 0.025, 0.035, 0.035, 0.079, 0.079, 0.072, 0.072,
+                        0.062, 0.062, 0.107, 0.107, 0.087, 0.087, 0.089, 0.089], dtype=np.float32)
+MIN_KEYPOINT_CONF = 0.3  # Below this a keypoint does not count for matching
+
+def tile_origins(length, tile_size, overlap):
+    """Start offsets along one axis; the last tile is aligned to the edge"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+def tile_grid(width, height, tile_size, overlap=0.2):
+    """(x1, y1, x2, y2) of overlapping tiles covering the image"""
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in tile_origins(height, tile_size, overlap)
+            for x in tile_origins(width, tile_size, overlap)]
+
+def keypoint_similarity(kpts, conf, other_kpts, other_conf, box):
+    """
+    Object keypoint similarity of one person against (N, K, 2) others over
+    the joints visible in both. None where fewer than 3 joints are shared.
+    """
+    sigmas = COCO_SIGMAS if kpts.shape[0] == len(COCO_SIGMAS) else np.full(kpts.shape[0], 0.05)
+    area = max((box[2] - box[0]) * (box[3] - box[1]), 1.0)
+    shared = (conf >= MIN_KEYPOINT_CONF)[None, :] & (other_conf >= MIN_KEYPOINT_CONF)
+    distance_sq = ((other_kpts - kpts[None]) ** 2).sum(axis=2)
+    similarity = np.exp(-distance_sq / (2 * area * (2 * sigmas[None]) ** 2))
+    counts = shared.sum(axis=1)
+    oks = np.where(shared, similarity, 0.0).sum(axis=1) / np.maximum(counts, 1)
+    return np.where(counts >= 3, oks, np.nan)
+
+def keypoint_nms(detections, iou_threshold=0.5, oks_threshold=0.5):
+    """
+    Merge duplicates of the same person seen by overlapping tiles. Two
+    detections are duplicates when their boxes overlap (measured against
+    the smaller box, since a tile edge cuts people off) and, where both
+    have enough visible joints, their keypoints agree. Overlapping people
+    with different poses are kept. Each kept person takes the more
+    confident position of every joint from its duplicates.
+    """
+    if len(detections["boxes"]) < 2:
+        return detections
+    detections = {key: value.copy() for key, value in detections.items()}
+    boxes, scores = detections["boxes"], detections["scores"]
+    keypoints, keypoint_conf = detections["keypoints"], detections["keypoint_conf"]
+
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        if not rest.size:
+            break
+        overlap = box_iou(boxes[best], boxes[rest], containment=True)
+        oks = keypoint_similarity(keypoints[best], keypoint_conf[best],
+                                  keypoints[rest], keypoint_conf[rest], boxes[best])
+        duplicate = (overlap > iou_threshold) & (np.isnan(oks) | (oks > oks_threshold))
+        for other in rest[duplicate]:
+            better = keypoint_conf[other] > keypoint_conf[best]
+            keypoints[best][better] = keypoints[other][better]
+            keypoint_conf[best][better] = keypoint_conf[other][better]
+            boxes[best] = [min(boxes[best][0], boxes[other][0]), min(boxes[best][1], boxes[other][1]),
+                           max(boxes[best][2], boxes[other][2]), max(boxes[best][3], boxes[other][3])]
+        order = rest[~duplicate]
+    return select_detections(detections, np.asarray(keep, dtype=np.int64))
+
+def infer_tiled(model, image, tile_size, overlap=0.2, confidence_threshold=0.5,
+                iou_threshold=0.5, imgsz=640, include_full=True):
+    """
+    Run the pose model on overlapping tiles of the image in one batch and
+    return merged detections in image coordinates. With include_full the
+    whole image is added to the batch so people larger than a tile are
+    still found whole.
+    """
+    height, width = image.shape[:2]
+    views, offsets = [], []
+    for x1, y1, x2, y2 in tile_grid(width, height, tile_size, overlap):
+        views.append(image[y1:y2, x1:x2])
+        offsets.append((x1, y1))
+    if include_full and len(views) > 1:
+        views.append(image)
+        offsets.append((0, 0))
+
+    results = model(views, conf=confidence_threshold, imgsz=imgsz, verbose=False)
+
+    parts = [result_to_detections(result, offset_x, offset_y, tile_index)
+             for tile_index, (result, (offset_x, offset_y)) in enumerate(zip(results, offsets))]
+    detections = concat_detections(parts)
+    if not len(detections["boxes"]):
+        return empty_detections()
+    return keypoint_nms(detections, iou_threshold)
@@ -0,0 +1,113 @@
+#priority queue for VLM verification, ranked by detector-side signals with aging
+import os
+import csv
+import heapq
+import threading
+from vlm_payload import load_sidecar
+
+# Score weights (before the per-camera weight)
+MARGIN_WEIGHT = 1.0   # How deep inside the thresholds the joints sit
+PERSONS_WEIGHT = 0.5  # More flagged persons in one frame
+AGING_SECONDS = 120   # Waiting this long is worth +1 priority, so nothing starves
+
+def joint_margin(value, value_range):
+    """1.0 at the centre of the range, 0.0 at (or past) its edges"""
+    low, high = value_range
+    half_width = (high - low) / 2.0
+    if half_width <= 0:
+        return 0.0
+    margin = min(value - low, high - value) / half_width
+    return max(0.0, min(1.0, margin))
+
+def pose_margin(validation, ranges, measured=None):
+    """
+    Mean margin over the joints that were measured. Unmeasured joints are
+    reported as 0.0 and would score as if they sat inside their range, so
+    they are skipped; without measured flags every joint counts.
+    """
+    if not validation or not ranges:
+        return 0.0
+    measured = measured or {}
+    margins = [joint_margin(value, ranges[joint])
+               for joint, value in validation.items() if joint in ranges and measured.get(joint, True)]
+    return sum(margins) / len(margins) if margins else 0.0
+
+def detection_priority(sidecar, camera_weights=None):
+    """Priority score of a detection from its sidecar record (higher = sooner)"""
+    if not sidecar:
+        return 0.0
+    ranges = sidecar.get("ranges")
+    # Frame sidecars hold lists for every person, crop sidecars one person's dicts
+    validations = sidecar.get("validations") or [sidecar.get("validation")]
+    measured = sidecar.get("measured")
+    measured = [measured] if isinstance(measured, dict) else measured or [None] * len(validations)
+    margin = max([pose_margin(v, ranges, m) for v, m in zip(validations, measured)] or [0.0])
+    persons = sidecar.get("persons") or 1
+    score = MARGIN_WEIGHT * margin + PERSONS_WEIGHT * min(persons, 3) / 3.0
+
+    camera = sidecar.get("camera") or sidecar.get("source")
+    weight = camera_weights.get(camera, 1.0) if camera_weights else 1.0
+    return score * weight
+
+def load_camera_weights(csv_file):
+    """Per-camera weights from a CSV of (camera address, weight); missing file = all 1.0"""
+    weights = {}
+    if not os.path.exists(csv_file):
+        return weights
+    with open(csv_file, 'r') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2 and row[0].strip():
+                try:
+                    weights[row[0].strip()] = float(row[1])
+                except ValueError:
+                    continue  # Header or malformed line
+    print(f"Loaded {len(weights)} camera weights from {csv_file}")
+    return weights
+
+class VerifyQueue:
+    """
+    Max-priority queue of spool items. Aging adds (wait / AGING_SECONDS) to every
+    item at the same rate, so the effective order is fixed at push time:
+    key = score - enqueued_at / AGING_SECONDS.
+    """
+    def __init__(self, camera_weights=None, aging_seconds=AGING_SECONDS):
+        self.camera_weights = camera_weights or {}
+        self.aging_seconds = aging_seconds
+        self.heap = []
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.queued)
+
+    def push(self, name, score, enqueued_at):
+        with self.lock:
+            if name in self.queued:
+                return
+            key = score - enqueued_at / self.aging_seconds
+            heapq.heappush(self.heap, (-key, enqueued_at, name))
+            self.queued.add(name)
+
+    def refresh(self, spool_dir, names):
+        """Add newly published spool items, scored from their sidecars"""
+        added = 0
+        for name in names:
+            if name in self.queued:
+                continue
+            path = os.path.join(spool_dir, name)
+            try:
+                enqueued_at = os.path.getmtime(path)  # Publish time
+            except FileNotFoundError:
+                continue
+            self.push(name, detection_priority(load_sidecar(path), self.camera_weights), enqueued_at)
+            added += 1
+        return added
+
+    def pop(self):
+        """Highest-priority item name, or None"""
+        with self.lock:
+            if not self.heap:
+                return None
+            _, _, name = heapq.heappop(self.heap)
+            self.queued.discard(name)
+            return name
@@ -0,0 +1,141 @@
+#keyframe-aligned chunks of one long recording, decoded in parallel worker processes
+import os
+import bisect
+import subprocess
+import multiprocessing
+import cv2
+
+class Chunk:
+    """Frames [start_frame, end_frame) of a video; start_frame is a keyframe"""
+    def __init__(self, index, start_frame, end_frame, start_time, end_time):
+        self.index = index
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.start_time = start_time  # Seconds into the video (presentation time)
+        self.end_time = end_time
+
+    def __len__(self):
+        return self.end_frame - self.start_frame
+
+    def __repr__(self):
+        return (f"Chunk({self.index}, frames {self.start_frame}-{self.end_frame}, "
+                f"{self.start_time:.1f}s-{self.end_time:.1f}s)")
+
+def probe_frames(source):
+    """
+    Presentation times of all frames and of the keyframes of the first video
+    stream, read from the container index with ffprobe (nothing is decoded).
+    Times are seconds from the first frame, the origin OpenCV uses for
+    CAP_PROP_POS_MSEC. Returns None if ffprobe is not available or cannot
+    read the file.
+    """
+    command = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", source]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not probe keyframes of {source}: {e}")
+        return None
+    frame_times, keyframe_times = [], []
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or fields[0] in ("", "N/A"):
+            continue
+        pts_time = float(fields[0])
+        frame_times.append(pts_time)
+        if "K" in fields[1]:
+            keyframe_times.append(pts_time)
+    if not frame_times:
+        return None
+    # Packets come in decode order; B-frames make that differ from display order
+    frame_times.sort()
+    keyframe_times.sort()
+    origin = frame_times[0]
+    return [t - origin for t in frame_times], [t - origin for t in keyframe_times]
+
+def estimate_frames(source):
+    """Fallback without ffprobe: frame times from the frame rate, one chunk only"""
+    cap = cv2.VideoCapture(source)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+    return [i / fps for i in range(total_frames)], [0.0]
+
+def plan_chunks(frame_times, keyframe_times, count):
+    """
+    Split the video into about count chunks of similar length. Every chunk
+    starts on a keyframe, so a worker decodes nothing outside its own range.
+    """
+    total_frames = len(frame_times)
+    keyframes = sorted(set(bisect.bisect_left(frame_times, t) for t in keyframe_times) - {0, total_frames})
+    bounds = {0, total_frames}
+    for i in range(1, count):
+        if not keyframes:
+            break
+        target = i * total_frames / count
+        nearest = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, nearest - 1):nearest + 1]
+        bounds.add(min(candidates, key=lambda frame: abs(frame - target)))
+    bounds = sorted(bounds)
+    return [Chunk(i, start, end, frame_times[start], frame_times[end - 1])
+            for i, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+
+def nearest_frame(frame_times, t):
+    """Index of the probed frame time closest to t"""
+    i = bisect.bisect_left(frame_times, t)
+    if i == len(frame_times) or (i > 0 and t - frame_times[i - 1] < frame_times[i] - t):
+        i -= 1
+    return i
+
+def read_chunk(source, chunk, frame_times):
+    """
+    (global frame number, frame) for every frame of the chunk: a single seek
+    by time to its first keyframe, then plain sequential reads. frame_times
+    are the probed times of the chunk's own frames; every decoded frame is
+    numbered by its timestamp, so a seek that lands early is decoded forward
+    and a frame-count seek error cannot shift the numbering.
+    """
+    # Half a frame interval: timestamps closer than that belong to the same frame
+    tolerance = (frame_times[1] - frame_times[0]) / 2 if len(frame_times) > 1 else 1 / 60
+    cap = cv2.VideoCapture(source)
+    try:
+        if chunk.start_frame:
+            cap.set(cv2.CAP_PROP_POS_MSEC, chunk.start_time * 1000)
+        next_frame = chunk.start_frame
+        while next_frame < chunk.end_frame:
+            ret, frame = cap.read()
+            if not ret:
+                print(f"{chunk}: stream ended early at frame {next_frame}")
+                break
+            frame_time = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if frame_time < frame_times[0] - tolerance:
+                continue  # Seek landed before the chunk; decode forward
+            if frame_time > frame_times[-1] + tolerance:
+                break
+            frame_number = chunk.start_frame + nearest_frame(frame_times, frame_time)
+            if frame_number < next_frame:
+                continue  # Same timestamp as the previous frame
+            if frame_number > next_frame:
+                print(f"{chunk}: frames {next_frame}-{frame_number - 1} not decoded")
+            next_frame = frame_number + 1
+            yield frame_number, frame
+    finally:
+        cap.release()
+
+def worker_threads(workers):
+    """Cores per worker so the processes together do not oversubscribe the CPU"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def run_chunks(worker, tasks, workers, initializer=None, initargs=()):
+    """
+    worker(task) for every task in a pool of spawned processes (each loads its
+    own model in initializer); results come back in task order.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [worker(task) for task in tasks]
+    # Spawn: CUDA and the ultralytics/torch state do not survive fork
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=initializer, initargs=initargs) as pool:
+        return pool.map(worker, tasks, chunksize=1)
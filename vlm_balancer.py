@@ -0,0 +1,243 @@
+#client-side load balancer over several Ollama endpoints with circuit breaking and health probes
+import requests
+import json
+import time
+import random
+import threading
+import http.server
+import socketserver
+
+CLOSED = "closed"        # Healthy, takes traffic
+OPEN = "open"            # Failing, no traffic until the reset timeout or a good probe
+HALF_OPEN = "half_open"  # One trial request decides whether to close again
+
+def base_url(chat_url):
+    """http://host:11434/api/chat -> http://host:11434"""
+    return chat_url.split("/api/")[0].rstrip("/")
+
+class Endpoint:
+    def __init__(self, chat_url):
+        self.chat_url = chat_url
+        self.outstanding = 0
+        self.failures = 0  # Consecutive failures
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.latency = None  # Moving average of request time in seconds
+        self.requests = 0
+        self.errors = 0
+        self.model_digests = None  # Model name -> digest from the last good probe, None = never probed
+
+    def snapshot(self):
+        return {
+            "url": self.chat_url,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+class VLMBalancer:
+    """Least-outstanding-requests routing over a list of /api/chat URLs"""
+    def __init__(self, chat_urls, failure_threshold=3, reset_timeout=30,
+                 health_interval=15, health_timeout=3, max_attempts=2):
+        if not chat_urls:
+            raise ValueError("VLMBalancer needs at least one endpoint")
+        self.endpoints = [Endpoint(url) for url in chat_urls]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.health_thread = None
+        if health_interval:
+            self.health_thread = threading.Thread(target=self._health_loop, name="vlm-health", daemon=True)
+            self.health_thread.start()
+
+    def _available(self, endpoint, now):
+        if endpoint.state == OPEN and now - endpoint.opened_at >= self.reset_timeout:
+            endpoint.state = HALF_OPEN
+        if endpoint.state == HALF_OPEN:
+            return endpoint.outstanding == 0  # Only one trial request at a time
+        return endpoint.state == CLOSED
+
+    def acquire(self, exclude=()):
+        """Pick the available endpoint with the fewest requests in flight"""
+        with self.lock:
+            now = time.time()
+            candidates = [e for e in self.endpoints if e not in exclude and self._available(e, now)]
+            if not candidates:
+                return None
+            fewest = min(e.outstanding for e in candidates)
+            least_loaded = [e for e in candidates if e.outstanding == fewest]
+            # Break ties by observed latency, unknown latency first so new boxes get traffic
+            least_loaded.sort(key=lambda e: (e.latency is not None, e.latency or 0.0, random.random()))
+            endpoint = least_loaded[0]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _finish(self, endpoint, ok, elapsed=None):
+        with self.lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.state = CLOSED
+                if elapsed is not None:
+                    endpoint.latency = elapsed if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * elapsed
+            else:
+                endpoint.errors += 1
+                endpoint.failures += 1
+                if endpoint.state == HALF_OPEN or endpoint.failures >= self.failure_threshold:
+                    if endpoint.state != OPEN:
+                        print(f"Circuit opened for {endpoint.chat_url}")
+                    endpoint.state = OPEN
+                    endpoint.opened_at = time.time()
+
+    def request(self, send):
+        """
+        Run send(chat_url) on the best endpoint, retrying on another endpoint
+        if it raises. Raises the last error when every attempt failed.
+        """
+        tried = []
+        last_error = RuntimeError("No VLM endpoint available")
+        for _ in range(self.max_attempts):
+            endpoint = self.acquire(exclude=tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint)
+            start = time.time()
+            try:
+                result = send(endpoint.chat_url)
+            except Exception as e:
+                self._finish(endpoint, False)
+                print(f"VLM endpoint {endpoint.chat_url} failed: {e}")
+                last_error = e
+                continue
+            self._finish(endpoint, True, time.time() - start)
+            return result
+        raise last_error
+
+    def probe(self, endpoint):
+        """Health check: the model list endpoint answers quickly on a live server"""
+        try:
+            response = requests.get(base_url(endpoint.chat_url) + "/api/tags", timeout=self.health_timeout)
+            healthy = response.status_code == 200
+            # The same answer says which model build sits behind each tag
+            models = response.json().get("models", []) if healthy else []
+            digests = {model.get("name") or model.get("model"): model.get("digest") for model in models}
+        except Exception:
+            healthy = False
+        with self.lock:
+            if healthy:
+                endpoint.model_digests = digests
+            elif endpoint.model_digests is None:
+                endpoint.model_digests = {}  # Unreachable: do not probe again on every lookup
+            if healthy and endpoint.state == OPEN:
+                # Let one real request decide; a live server can still fail chats
+                print(f"Health probe OK, trial request next for {endpoint.chat_url}")
+                endpoint.state = HALF_OPEN
+            elif not healthy and endpoint.state != OPEN:
+                print(f"Health probe failed, opening circuit for {endpoint.chat_url}")
+                endpoint.state = OPEN
+                endpoint.opened_at = time.time()
+        return healthy
+
+    def _health_loop(self):
+        while not self.stopped.wait(self.health_interval):
+            for endpoint in self.endpoints:
+                self.probe(endpoint)
+
+    def model_digest(self, model):
+        """
+        Digest of model on the endpoints, so a new build pulled behind the same
+        tag (e.g. gemma3:latest) is noticed. Endpoints never probed are probed
+        now; None if no endpoint reports the model.
+        """
+        name = model if ":" in model else f"{model}:latest"
+        for endpoint in self.endpoints:
+            if endpoint.model_digests is None:
+                self.probe(endpoint)
+        with self.lock:
+            digests = {e.model_digests.get(name) for e in self.endpoints if e.model_digests}
+        digests = sorted(digest for digest in digests if digest)
+        return "+".join(digests) if digests else None
+
+    def available_count(self):
+        with self.lock:
+            now = time.time()
+            return sum(1 for e in self.endpoints if self._available(e, now))
+
+    def stats(self):
+        with self.lock:
+            return [e.snapshot() for e in self.endpoints]
+
+    def close(self):
+        self.stopped.set()
+
+def run_stub_server(port, delay=0.2, fail_rate=0.0, answer=None):
+    """
+    Minimal stand-in for Ollama on localhost for testing the balancer:
+    /api/tags answers 200, /api/chat answers after `delay` seconds or fails
+    with HTTP 500 at `fail_rate`. Returns the server; call shutdown() to stop.
+    """
+    answer = answer or {"unzip_confidence": 1, "looking_confidence": 1, "headcount": 1}
+
+    class StubHandler(http.server.BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/api/tags':
+                self._reply(200, {"models": [{"name": "stub"}]})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            if random.random() < fail_rate:
+                self._reply(500, {"error": "stub failure"})
+            else:
+                self._reply(200, {"message": {"role": "assistant", "content": json.dumps(answer)}, "done": True})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    # Self-check against local stubs: one fast, one slow, one that always fails
+    from concurrent.futures import ThreadPoolExecutor
+
+    stubs = [run_stub_server(18081, delay=0.1), run_stub_server(18082, delay=0.4),
+             run_stub_server(18083, fail_rate=1.0)]
+    balancer = VLMBalancer([f"http://127.0.0.1:{port}/api/chat" for port in (18081, 18082, 18083)],
+                           health_interval=2)
+
+    def send(chat_url):
+        response = requests.post(chat_url, json={"model": "stub", "messages": []}, timeout=5)
+        if response.status_code != 200:
+            raise RuntimeError(f"status {response.status_code}")
+        return response.json()
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: balancer.request(send), range(60)))
+    print(f"{len(results)} requests in {time.time() - start:.1f}s")
+    for endpoint in balancer.stats():
+        print(endpoint)
+
+    balancer.close()
+    for stub in stubs:
+        stub.shutdown()
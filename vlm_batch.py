@@ -0,0 +1,77 @@
+#batched multi-image VLM verification with per-image result demultiplexing
+import json
+import re
+
+RESULT_KEYS = ("unzip_confidence", "looking_confidence", "headcount")
+
+BATCH_INSTRUCTION = (
+    "\n\nBATCH MODE:\n"
+    "You are given {count} separate images, numbered 0 to {last} in the order they are attached. "
+    "Evaluate each image independently.\n"
+    "Respond ONLY with a JSON array of exactly {count} objects, one per image, each with the keys "
+    "'index' (image number), 'unzip_confidence', 'looking_confidence' and 'headcount'."
+)
+
+def extract_json_text(content):
+    """Strip markdown code fences around a JSON answer"""
+    json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', content, re.DOTALL)
+    if json_match:
+        return json_match.group(1).strip()
+    return content.strip()
+
+def build_batch_request(model, system_prompt, user_message, encoded_images):
+    """One /api/chat body carrying every image, with an indexed response schema"""
+    instruction = BATCH_INSTRUCTION.format(count=len(encoded_images), last=len(encoded_images) - 1)
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt + instruction},
+            {
+                "role": "user",
+                "content": user_message + instruction,
+                "images": list(encoded_images)
+            }
+        ],
+        "format": "json",
+        "stream": False
+    }
+
+def parse_batch_response(content, count):
+    """
+    Split a batch answer into one result dict per image, in attachment order.
+    Raises ValueError when the answer does not match the schema.
+    """
+    data = json.loads(extract_json_text(content))
+    # Some models wrap the array in an object, e.g. {"results": [...]}
+    if isinstance(data, dict):
+        arrays = [v for v in data.values() if isinstance(v, list)]
+        if len(arrays) != 1:
+            raise ValueError("Batch response is not a JSON array")
+        data = arrays[0]
+    if not isinstance(data, list) or len(data) != count:
+        raise ValueError(f"Expected {count} results, got {len(data) if isinstance(data, list) else 'none'}")
+
+    results = [None] * count
+    for position, item in enumerate(data):
+        if not isinstance(item, dict) or any(key not in item for key in RESULT_KEYS):
+            raise ValueError(f"Result {position} is missing required keys")
+        index = item.get("index", position)
+        if not isinstance(index, int) or not 0 <= index < count or results[index] is not None:
+            raise ValueError(f"Result {position} has an invalid index {index!r}")
+        results[index] = {key: item[key] for key in RESULT_KEYS}
+    return results
+
+def verify_batch(encoded_images, send_request, model, system_prompt, user_message, single_fallback):
+    """
+    Verify several images with one request. send_request(data) returns the
+    parsed /api/chat response. If the batch answer is malformed, every image is
+    verified on its own with single_fallback(index), which returns a result or None.
+    """
+    if len(encoded_images) == 1:
+        return [single_fallback(0)]
+    try:
+        response_json = send_request(build_batch_request(model, system_prompt, user_message, encoded_images))
+        return parse_batch_response(response_json["message"]["content"], len(encoded_images))
+    except Exception as e:
+        print(f"Batch of {len(encoded_images)} failed ({e}); falling back to single-image requests")
+        return [single_fallback(i) for i in range(len(encoded_images))]
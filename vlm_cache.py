@@ -0,0 +1,174 @@
+#VLM verification result cache keyed by a perceptual hash of the image plus prompt and model
+import cv2
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash: stable under re-encoding and small pixel changes"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+def prompt_key(model, system_prompt, user_message, model_digest=None):
+    """
+    Short fingerprint of everything besides the image that shapes the answer.
+    Pass the model's digest: a tag like gemma3:latest can point to a new build.
+    """
+    digest = hashlib.sha1(f"{model}\n{model_digest}\n{system_prompt}\n{user_message}".encode('utf-8')).hexdigest()
+    return digest[:16]
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+class VerificationCache:
+    """
+    LRU cache with TTL, persisted to a JSON file. Entries match when the prompt
+    key and camera are equal, the image hashes differ by at most max_distance
+    bits and the person boxes overlap by at least min_box_iou, so similar
+    crops of different people at one station do not share a verdict.
+    """
+    def __init__(self, cache_file="vlm_cache.json", max_entries=5000, ttl_seconds=7 * 24 * 3600,
+                 max_distance=4, min_box_iou=0.5, save_every=20):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.min_box_iou = min_box_iou
+        self.save_every = save_every
+        self.entries = OrderedDict()  # (prompt_key, camera, image_hash) -> (created, result, box)
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # One save at a time; put() saves outside self.lock
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = 0
+        self.load()
+
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as file:
+                rows = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cache file {self.cache_file}: {e}")
+            return
+        now = time.time()
+        for row in rows:
+            if len(row) != 6:
+                continue  # Written before camera and box were recorded
+            key_prompt, camera, image_hash, created, result, box = row
+            if now - created < self.ttl_seconds:
+                self.entries[(key_prompt, camera, image_hash)] = (created, result, box)
+        print(f"Loaded {len(self.entries)} cached verifications from {self.cache_file}")
+
+    def save(self):
+        """Best effort: a failed save is logged and retried with the next batch of puts"""
+        if not self.cache_file:
+            return
+        with self.save_lock:
+            with self.lock:
+                rows = [[k[0], k[1], k[2], created, result, box]
+                        for k, (created, result, box) in self.entries.items()]
+                self.unsaved = 0
+            try:
+                self._write(json.dumps(rows).encode('utf-8'))
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Could not save cache file {self.cache_file}: {e}")
+
+    def _write(self, data):
+        """
+        Write to a unique temp file next to the cache file and rename it into
+        place, so several verifier processes can share one cache file.
+        """
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.cache_file) + ".",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.cache_file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _same_person(self, cached_box, box):
+        if cached_box is None or box is None:
+            return cached_box is None and box is None
+        return box_iou(cached_box, box) >= self.min_box_iou
+
+    def _find(self, key_prompt, image_hash, camera, box):
+        key = (key_prompt, camera, image_hash)
+        if key in self.entries and self._same_person(self.entries[key][2], box):
+            return key
+        if self.max_distance <= 0:
+            return None
+        # Near-duplicate frames: nearest hash within max_distance bits
+        best_key, best_distance = None, self.max_distance + 1
+        for candidate, (_, _, cached_box) in self.entries.items():
+            if candidate[0] != key_prompt or candidate[1] != camera:
+                continue
+            distance = hamming_distance(candidate[2], image_hash)
+            if distance < best_distance and self._same_person(cached_box, box):
+                best_key, best_distance = candidate, distance
+        return best_key
+
+    def get(self, key_prompt, image_hash, camera=None, box=None):
+        """Cached result for this image of a person seen by camera at box, or None"""
+        now = time.time()
+        with self.lock:
+            key = self._find(key_prompt, image_hash, camera, box)
+            if key is not None:
+                created, result, _ = self.entries[key]
+                if now - created < self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key_prompt, image_hash, result, camera=None, box=None):
+        with self.lock:
+            key = (key_prompt, camera, image_hash)
+            self.entries[key] = (time.time(), result, [int(v) for v in box] if box is not None else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.unsaved += 1
+            should_save = self.unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
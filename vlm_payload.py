@@ -0,0 +1,148 @@
+#VLM payload builder: crop to flagged persons, resize to the model input, re-encode, cache
+import cv2
+import numpy as np
+import os
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from frame_writer import sidecar_path, encode_jpeg
+from vlm_cache import dhash
+
+# gemma3 tiles images to 896x896; anything larger is downscaled by the server anyway
+DEFAULT_TARGET_SIZE = 896
+DEFAULT_JPEG_QUALITY = 85
+
+def load_sidecar(image_path):
+    """Detection record written next to the image, or None"""
+    try:
+        with open(sidecar_path(image_path), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def person_boxes(sidecar, image_shape):
+    """Boxes of the flagged persons in image coordinates, if the image is a full frame"""
+    if not sidecar:
+        return []
+    height, width = image_shape[:2]
+    frame_size = sidecar.get("frame_size")
+    # Crop evidence is already cut to the person: nothing left to crop
+    if frame_size and (frame_size[0] != width or frame_size[1] != height):
+        return []
+    if "boxes" in sidecar:
+        return sidecar["boxes"]
+    if "bbox" in sidecar and frame_size:
+        return [sidecar["bbox"]]
+    return []
+
+def subject_of(sidecar):
+    """(camera, box in frame coordinates) of the flagged person(s), for matching cached verdicts"""
+    if not sidecar:
+        return None, None
+    camera = sidecar.get("camera", sidecar.get("source"))
+    if sidecar.get("bbox"):
+        return camera, [int(v) for v in sidecar["bbox"]]
+    boxes = sidecar.get("boxes")
+    if not boxes:
+        return camera, None
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return camera, [int(boxes[:, 0].min()), int(boxes[:, 1].min()), int(boxes[:, 2].max()), int(boxes[:, 3].max())]
+
+def crop_to_boxes(image, boxes, padding=0.10):
+    """Crop the image to the union of the boxes plus padding"""
+    if not boxes:
+        return image
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+    x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    height, width = image.shape[:2]
+    x1 = int(max(0, x1 - pad_x))
+    y1 = int(max(0, y1 - pad_y))
+    x2 = int(min(width, x2 + pad_x))
+    y2 = int(min(height, y2 + pad_y))
+    if x2 <= x1 or y2 <= y1:
+        return image
+    return image[y1:y2, x1:x2]
+
+def resize_to_target(image, target_size=DEFAULT_TARGET_SIZE):
+    """Downscale so the longest side is target_size; never upscale"""
+    height, width = image.shape[:2]
+    scale = target_size / float(max(height, width))
+    if scale >= 1.0:
+        return image
+    new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+
+class PayloadBuilder:
+    """Builds base64 image payloads for the VLM and keeps an LRU cache of them"""
+    def __init__(self, target_size=DEFAULT_TARGET_SIZE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                 padding=0.10, cache_entries=256):
+        self.target_size = target_size
+        self.jpeg_quality = jpeg_quality
+        self.padding = padding
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"built": 0, "cache_hits": 0, "source_bytes": 0, "payload_bytes": 0, "build_ms": 0.0}
+
+    def _cache_key(self, image_path, sidecar):
+        # Name, size and sidecar, not the mtime: claiming and renewing a spool lease touch the image
+        return (os.path.basename(image_path), os.path.getsize(image_path),
+                json.dumps(sidecar, sort_keys=True, default=str),
+                self.target_size, self.jpeg_quality, self.padding)
+
+    def build(self, image_path, sidecar=None):
+        """
+        Return (base64_payload, info) for an image. info holds the source and
+        payload sizes so the caller can track them per request.
+        """
+        sidecar = sidecar if sidecar is not None else load_sidecar(image_path)
+        key = self._cache_key(image_path, sidecar)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return self.cache[key]
+
+        build_start = time.time()
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not decode image {image_path}")
+
+        image = crop_to_boxes(image, person_boxes(sidecar, image.shape), self.padding)
+        image = resize_to_target(image, self.target_size)
+        encoded = base64.b64encode(encode_jpeg(image, self.jpeg_quality)).decode('utf-8')
+
+        camera, box = subject_of(sidecar)
+        info = {
+            "source_bytes": key[1],
+            "payload_bytes": len(encoded),
+            "width": int(image.shape[1]),
+            "height": int(image.shape[0]),
+            "dhash": dhash(image),  # Key for the verification result cache
+            "camera": camera,
+            "box": box,
+            "build_ms": round((time.time() - build_start) * 1000, 1),
+        }
+        with self.lock:
+            self.stats["built"] += 1
+            self.stats["source_bytes"] += info["source_bytes"]
+            self.stats["payload_bytes"] += info["payload_bytes"]
+            self.stats["build_ms"] += info["build_ms"]
+            self.cache[key] = (encoded, info)
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return encoded, info
+
+    def summary(self):
+        """Totals and the average payload reduction so far"""
+        with self.lock:
+            stats = dict(self.stats)
+        if stats["source_bytes"]:
+            # Base64 of the untouched file is 4/3 of its size
+            stats["reduction"] = round(1 - stats["payload_bytes"] / (stats["source_bytes"] * 4 / 3), 3)
+        return stats
@@ -0,0 +1,107 @@
+#streaming /api/chat client that stops generation once the JSON answer is complete
+import requests
+import json
+import time
+
+class JsonValueScanner:
+    """Incrementally finds the first complete top-level JSON object or array in a text stream"""
+    def __init__(self):
+        self.text = ""
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.position = 0
+
+    def feed(self, chunk):
+        """Add text; returns the complete JSON string once it has arrived, else None"""
+        self.text += chunk
+        while self.position < len(self.text):
+            char = self.text[self.position]
+            self.position += 1
+            if self.start is None:
+                if char in "{[":
+                    self.start = self.position - 1
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    value = self.text[self.start:self.position]
+                    self.start = None
+                    return value
+        return None
+
+def _complete_answer(scanner, piece, required_keys):
+    """Feed a piece of text and return the answer JSON once it is complete"""
+    candidate = scanner.feed(piece)
+    while candidate is not None:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            value = None
+        if value is not None and (not required_keys or not isinstance(value, dict)
+                                  or all(key in value for key in required_keys)):
+            return candidate
+        candidate = scanner.feed("")
+    return None
+
+def stream_chat(url, data, headers=None, required_keys=None, timeout=120):
+    """
+    Send a chat request with streaming on and read tokens as they arrive.
+    As soon as a complete JSON value (with required_keys, if it is an object)
+    has been received, the connection is closed, which makes Ollama stop
+    generating. Returns a response dict shaped like the non-streaming API.
+    """
+    body = dict(data)
+    body["stream"] = True
+    request_start = time.time()
+    content = ""
+    chunks = 0
+    early_stop = False
+    scanner = JsonValueScanner()
+
+    response = requests.post(url, headers=headers, json=body, stream=True, timeout=timeout)
+    try:
+        if response.status_code != 200:
+            raise RuntimeError(f"API request failed with status code: {response.status_code}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            piece = message.get("message", {}).get("content", "")
+            content += piece
+            chunks += 1
+
+            answer = _complete_answer(scanner, piece, required_keys)
+            if answer is not None:
+                content = answer
+                early_stop = not message.get("done", False)
+                break
+            if message.get("done"):
+                break
+    finally:
+        # Closing the connection mid-stream cancels the rest of the generation
+        response.close()
+
+    return {
+        "message": {"role": "assistant", "content": content},
+        "stream_stats": {
+            "chunks": chunks,
+            "early_stop": early_stop,
+            "seconds": round(time.time() - request_start, 3),
+        }
+    }
@@ -5,6 +5,15 @@ import os
 import time
 import shutil, re
 from IPython.display import display, Image
+import spool
+from event_store import EventStore
+from vlm_payload import PayloadBuilder
+from vlm_batch import verify_batch, RESULT_KEYS
+from vlm_stream import stream_chat
+from verify_queue import VerifyQueue, load_camera_weights
+from vlm_balancer import VLMBalancer
+from concurrent.futures import ThreadPoolExecutor
+from vlm_cache import VerificationCache, prompt_key
 
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
@@ -27,7 +36,11 @@ def extract_json_content_robust(response_obj):
     extracted_data = json.loads(json_string)
     return extracted_data
 
-url = 'http://10.151.28.9:11434/api/chat'
+# Inference boxes; requests go to the one with the fewest in flight, failing boxes are skipped
+VLM_ENDPOINTS = [
+    'http://10.151.28.9:11434/api/chat',
+]
+balancer = VLMBalancer(VLM_ENDPOINTS, failure_threshold=3, reset_timeout=30, health_interval=15)
 headers = {
     'Content-Type': 'application/json'
 }
@@ -72,23 +85,62 @@ user_message = (
     "- Overall operator behavior patterns"
 )
 
+# Crops to the flagged persons and downsizes to the model's input size before base64
+payload_builder = PayloadBuilder(target_size=896, jpeg_quality=85)
+
+MODEL_NAME = "gemma3:latest"
+BATCH_SIZE = 4  # Images packed into one request; 1 disables batching
+STREAM_RESPONSES = True  # Stop generation as soon as the JSON answer is complete
+
+# Re-submitted or near-identical crops reuse the earlier answer instead of calling the VLM
+verification_cache = VerificationCache("vlm_cache.json", max_entries=5000,
+                                       ttl_seconds=7 * 24 * 3600, max_distance=4)
+
+def current_prompt_key():
+    """Cache key of the prompt and the model build the endpoints serve now; None disables the cache"""
+    model_digest = balancer.model_digest(MODEL_NAME)
+    if model_digest is None:
+        return None  # Unknown build: a cached verdict could come from another model
+    return prompt_key(MODEL_NAME, VLM_SYSTEM_PROMPT, user_message, model_digest)
+
 # Create confidence folders if they don't exist
 for i in range(1, 6):
     folder_name = f"conf_{i}"
     if not os.path.exists(folder_name):
         os.makedirs(folder_name)
 
-def process_image(image_path):
-    """Process a single image and return the unzip_confidence"""
+def send_chat(data, required_keys=None):
+    """POST one /api/chat request to the best endpoint and return the parsed response"""
+    return balancer.request(lambda url: post_chat(url, data, required_keys))
+
+def post_chat(url, data, required_keys=None):
+    """POST one /api/chat request to a given endpoint"""
+    if STREAM_RESPONSES:
+        response_json = stream_chat(url, data, headers=headers, required_keys=required_keys)
+        print(f"Stream: {response_json['stream_stats']}")
+        return response_json
+    
+    response = requests.post(url, headers=headers, json=data)
+    
+    # Print the response status code
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"API request failed with status code: {response.status_code}")
+    return response.json()
+
+def process_image(image_path, encoded_image=None):
+    """Process a single image and return the VLM result dict, or None if verification failed"""
     try:
-        # Encode the image
-        encoded_image = encode_image(image_path)
+        # Encode the image (cropped, resized and re-encoded)
+        if encoded_image is None:
+            encoded_image, _ = payload_builder.build(image_path)
         
         # Display the image in the notebook (optional)
         display(Image(filename=image_path))
 
         data = {
-            "model": "gemma3:latest",
+            "model": MODEL_NAME,
             "messages": [
                 {"role": "system", "content": VLM_SYSTEM_PROMPT},
                 {
@@ -100,37 +152,94 @@ def process_image(image_path):
             "stream": False
         }
 
-        response = requests.post(url, headers=headers, json=data)
-        
-        # Print the response status code
-        print(f"Status Code: {response.status_code}")
-
-        if response.status_code == 200:
-            try:
-                response_json = response.json()
-                extracted_json = extract_json_content_robust(response_json)
-                print(f"Analysis result: {extracted_json}")
-                return extracted_json.get('unzip_confidence', 1)
-            except json.JSONDecodeError:
-                print("Response is not valid JSON.")
-                print(response.text)
-                return 1
-            except Exception as e:
-                print(f"Error processing response: {e}")
-                return 1
-        else:
-            print(f"API request failed with status code: {response.status_code}")
-            return 1
+        response_json = send_chat(data, required_keys=RESULT_KEYS)
+        try:
+            extracted_json = extract_json_content_robust(response_json)
+            print(f"Analysis result: {extracted_json}")
+            return extracted_json
+        except json.JSONDecodeError:
+            print("Response is not valid JSON.")
+            print(response_json)
+            return None
+        except Exception as e:
+            print(f"Error processing response: {e}")
+            return None
             
     except Exception as e:
         print(f"Error processing image {image_path}: {e}")
-        return 1
+        return None
+
+def process_batch(image_paths):
+    """
+    Verify several images in one request; returns (results, payload_infos).
+    Each info carries latency_ms of the VLM request that answered the image
+    (its own request if the batch fell back to single images, None on a cache hit).
+    """
+    encoded_images = []
+    payload_infos = []
+    for image_path in image_paths:
+        try:
+            encoded_image, payload_info = payload_builder.build(image_path)
+            payload_info = dict(payload_info, latency_ms=None)  # The builder caches its info dicts
+        except Exception as e:
+            print(f"Error encoding image {image_path}: {e}")
+            encoded_image, payload_info = None, {}
+        encoded_images.append(encoded_image)
+        payload_infos.append(payload_info)
+    
+    # Cache hits skip the VLM; undecodable images are failed individually,
+    # the rest share one request
+    results = [None] * len(image_paths)
+    usable = []
+    key = current_prompt_key()
+    for i, encoded_image in enumerate(encoded_images):
+        if encoded_image is None:
+            continue
+        info = payload_infos[i]
+        cached = (verification_cache.get(key, info["dhash"], info["camera"], info["box"])
+                  if key is not None else None)
+        if cached is not None:
+            print(f"Cache hit: {os.path.basename(image_paths[i])}")
+            results[i] = cached
+        else:
+            usable.append(i)
+    if usable:
+        def single_request(k):
+            request_start = time.time()
+            try:
+                return process_image(image_paths[usable[k]], encoded_images[usable[k]])
+            finally:
+                payload_infos[usable[k]]["latency_ms"] = (time.time() - request_start) * 1000
+        
+        request_start = time.time()
+        batch_results = verify_batch(
+            [encoded_images[i] for i in usable], send_chat, MODEL_NAME,
+            VLM_SYSTEM_PROMPT, user_message, single_fallback=single_request)
+        request_ms = (time.time() - request_start) * 1000
+        for i, result in zip(usable, batch_results):
+            results[i] = result
+            if payload_infos[i]["latency_ms"] is None:
+                payload_infos[i]["latency_ms"] = request_ms
+            if result is not None and key is not None:
+                info = payload_infos[i]
+                verification_cache.put(key, info["dhash"], result, info["camera"], info["box"])
+    print(f"Batch analysis results: {results}")
+    return results, payload_infos
 
 # Main processing loop
+# Several verifier processes can run against the same spool: each image is
+# claimed by an atomic rename, so no file is processed twice or half-written.
+image_folder = "zipping_pose"
+failed_folder = "verify_failed"
+LEASE_SECONDS = 300  # Claims older than this belong to a crashed worker
+LEASE_RENEW_SECONDS = 60  # Leases of a batch in flight are renewed this often
+worker_id = spool.default_worker_id()
+# Clear violations and critical cameras go first; waiting items age upwards
+verify_queue = VerifyQueue(camera_weights=load_camera_weights("camera_weights.csv"))
+event_store = EventStore("events.db")  # Same database the scanner writes detections to
+request_pool = ThreadPoolExecutor(max_workers=len(VLM_ENDPOINTS))
+
 while True:
-    # Get list of images in zipping_pose folder
-    image_folder = "zipping_pose"
-    
     if not os.path.exists(image_folder):
         print(f"Folder '{image_folder}' not found. Creating it...")
         os.makedirs(image_folder)
@@ -138,36 +247,83 @@ while True:
         time.sleep(5)  # Wait 5 seconds before checking again
         continue
     
-    image_files = [f for f in os.listdir(image_folder) 
-                  if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff'))]
+    # Give back items left claimed by workers that died
+    spool.reclaim_expired(image_folder, LEASE_SECONDS)
+    
+    # Pick up newly published images, ranked by their detection sidecars
+    added = verify_queue.refresh(image_folder, spool.list_ready(image_folder))
     
-    if not image_files:
+    if not len(verify_queue):
         print("No images found in zipping_pose folder. Waiting for new images...")
         time.sleep(5)  # Wait 5 seconds before checking again
         continue
     
-    print(f"Found {len(image_files)} images to process")
+    if added:
+        print(f"Queued {added} new images, {len(verify_queue)} waiting")
     
-    # Process each image
-    for image_file in image_files:
-        image_path = os.path.join(image_folder, image_file)
-        print(f"Processing: {image_file}")
-        
-        # Get confidence level from VLM
-        confidence = process_image(image_path)
+    # Claim the highest-priority images for one batch per healthy endpoint,
+    # then rescan so new high-risk detections never wait behind the whole backlog
+    parallel_batches = balancer.available_count()
+    if parallel_batches == 0:
+        # Leave the images in the spool rather than failing them
+        print("No VLM endpoint available. Waiting...")
+        time.sleep(5)
+        continue
+    claims = []
+    while len(claims) < BATCH_SIZE * parallel_batches:
+        image_file = verify_queue.pop()
+        if image_file is None:
+            break
+        claim = spool.try_claim(image_folder, image_file, worker_id)
+        if claim is not None:  # None: another worker took it
+            claims.append(claim)
+    if not claims:
+        continue
+    
+    print(f"Processing: {[claim.name for claim in claims]}")
+    
+    # Get confidence levels from VLM, one request per endpoint in parallel
+    batches = [claims[i:i + BATCH_SIZE] for i in range(0, len(claims), BATCH_SIZE)]
+    results, payload_infos = [], []
+    # Slow endpoints, retries and single-image fallbacks can outlast a lease
+    with spool.renewing(claims, LEASE_RENEW_SECONDS):
+        for batch_results, batch_infos in request_pool.map(
+                lambda batch: process_batch([claim.path for claim in batch]), batches):
+            results.extend(batch_results)
+            payload_infos.extend(batch_infos)
+    
+    for claim, result, payload_info in zip(claims, results, payload_infos):
+        if result is None:
+            # Keep failures apart instead of filing them as confidence 1
+            if spool.complete(claim, failed_folder):
+                print(f"Verification failed, moved {claim.name} to {failed_folder}")
+            else:
+                print(f"Lost claim on {claim.name}; another worker reclaimed it")
+            continue
         
         # Ensure confidence is integer between 1-5
-        confidence = max(1, min(5, int(confidence)))
+        confidence = max(1, min(5, int(result.get('unzip_confidence', 1))))
         
         # Define target folder
         target_folder = f"conf_{confidence}"
         
-        # Move image to confidence folder
-        target_path = os.path.join(target_folder, image_file)
-        shutil.move(image_path, target_path)
-        print(f"Moved {image_file} to {target_folder}")
-        
-        # Small delay between processing images
-        time.sleep(1)
+        # Move image (and its sidecar) to confidence folder
+        if not spool.complete(claim, target_folder):
+            # Lease expired mid-batch: the worker that reclaimed the image records it
+            print(f"Lost claim on {claim.name}; another worker reclaimed it")
+            continue
+        print(f"Moved {claim.name} to {target_folder}")
+        event_store.record_verification(os.path.join(target_folder, claim.name), result,
+                                        model=MODEL_NAME, latency_ms=payload_info.get('latency_ms'),
+                                        payload_bytes=payload_info.get('payload_bytes'))
+    
+    # Small delay between requests
+    time.sleep(1)
     
-    print("Batch processing completed. Waiting for new images...")
\ No newline at end of file
+    # Backlog drained: persist the cache and report
+    if not len(verify_queue):
+        verification_cache.save()
+        print(f"Batch processing completed. Payload stats: {payload_builder.summary()}")
+        print(f"Verification cache: {verification_cache.metrics()}")
+        print(f"VLM endpoints: {balancer.stats()}")
+        print("Waiting for new images...")